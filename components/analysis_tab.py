@@ -1,9 +1,11 @@
 import streamlit as st
-import PIL.Image
+import html
 import json
 from datetime import datetime
-from services.analysis_service import analyze_image_content
+from services.analysis_service import analyze_image_content, analyze_image_content_stream, analyze_image_fused, ANALYSIS_TYPE_LABELS
+from config.config import UPLOAD_MAX_EDGE
 from utils.utils import save_to_history
+from utils.ingest import normalize_upload, format_ingest_stats
 
 def render_analysis_tab():
     st.header("Smart Image Analysis & Text Extraction")
@@ -17,23 +19,17 @@ def render_analysis_tab():
     )
     
     if analysis_image:
-        image = PIL.Image.open(analysis_image)
-        st.image(image, caption="Image for Analysis", use_container_width=True)
+        st.image(analysis_image, caption="Image for Analysis", use_container_width=True)
+        
+        if st.checkbox("Run several analyses in one request", key="fused_analysis"):
+            render_fused_analysis(analysis_image)
+            return
         
         # Analysis type selection
         st.markdown("**Choose Analysis Type:**")
         analysis_type = st.selectbox(
             "Analysis Focus:",
-            [
-                "Complete Analysis",
-                "Text Extraction (OCR)",
-                "People & Demographics", 
-                "Objects & Brand Detection",
-                "Technical Quality",
-                "Business Intelligence",
-                "Marketing Analysis",
-                "Content Safety Check"
-            ]
+            list(ANALYSIS_TYPE_LABELS)
         )
         
         # Additional options for text extraction
@@ -45,14 +41,24 @@ def render_analysis_tab():
             with col2:
                 enhance_text = st.checkbox("Enhance text quality", True)
                 translate_text = st.selectbox("Translate to:", ["No Translation", "English", "Hindi", "Tamil", "Spanish", "French"])
+        else:
+            structured = st.checkbox(
+                "Structured results",
+                False,
+                help="Ask for JSON against a fixed schema: shorter answers and ready-to-use exports"
+            )
         
         # Analyze button
         if st.button("Analyze Image", type="primary"):
             with st.spinner("Analyzing image with AI..."):
+                analysis_key = ANALYSIS_TYPE_LABELS[analysis_type]
+                image, ingest_stats = normalize_upload(analysis_image, analysis_key)
+                st.caption(format_ingest_stats(ingest_stats))
                 
                 if analysis_type == "Text Extraction (OCR)":
                     # Text extraction analysis
-                    extracted_text = analyze_image_content(image, "text_extraction")
+                    extracted_text = analyze_image_content(image, analysis_key, hedge=True)
+                    search_text = extracted_text
                     
                     if extracted_text and "NO TEXT DETECTED" not in extracted_text.upper():
                         st.success("Text extraction completed!")
@@ -110,29 +116,34 @@ def render_analysis_tab():
                 
                 else:
                     # General image analysis
-                    analysis_result = analyze_image_content(image, analysis_type.split()[0].lower() if " " in analysis_type else "complete")
+                    search_text = None
+                    if structured:
+                        analysis_result = analyze_image_content(image, analysis_key, hedge=True, structured=True)
+                    else:
+                        # Render text as it is generated rather than after the whole response
+                        analysis_result = st.write_stream(analyze_image_content_stream(image, analysis_key))
                     
-                    if analysis_result:
+                    if isinstance(analysis_result, str) and "Analysis error:" in analysis_result:
+                        st.error(analysis_result[analysis_result.index("Analysis error:"):])
+                    
+                    elif analysis_result:
                         st.success("Analysis completed!")
                         
-                        # Display analysis in structured format
-                        analysis_sections = analysis_result.split("\n\n") if isinstance(analysis_result, str) else [str(analysis_result)]
-                        
-                        for section in analysis_sections:
-                            if section.strip():
-                                if ":" in section:
-                                    title, content = section.split(":", 1)
-                                    st.markdown(f"**{title.strip()}:**")
-                                    st.markdown(f"<div class='analysis-card'>{content.strip()}</div>", unsafe_allow_html=True)
-                                else:
-                                    st.markdown(section.strip())
+                        if isinstance(analysis_result, str):
+                            report_results = analysis_result
+                            search_text = analysis_result
+                        else:
+                            # Typed result: already parsed, no text to split
+                            render_structured_analysis(analysis_result)
+                            report_results = analysis_result.model_dump()
+                            search_text = analysis_result.model_dump_json()
                         
                         # Export analysis
                         if st.button("Export Analysis Report"):
                             report_data = {
                                 "analysis_type": analysis_type,
                                 "timestamp": datetime.now().isoformat(),
-                                "results": analysis_result
+                                "results": report_results
                             }
                             st.download_button(
                                 "Download Analysis Report",
@@ -144,9 +155,94 @@ def render_analysis_tab():
                     else:
                         st.error("Analysis failed. Please try again.")
                 
-                # Save to analysis history
+                # Save to analysis history; the result text is indexed for search
                 save_to_history('analysis', {
                     'analysis_type': analysis_type,
                     'timestamp': datetime.now().isoformat(),
                     'success': True
-                })
+                }, search_text=search_text)
+
+# Analysis types that can be combined into one request
+FUSED_ANALYSIS_TYPES = {
+    label: ANALYSIS_TYPE_LABELS[label]
+    for label in ["Complete Analysis", "Text Extraction (OCR)", "People & Demographics", "Technical Quality"]
+}
+
+def render_fused_analysis(analysis_image):
+    """Several analysis types from one upload and one model call"""
+    selected = st.multiselect(
+        "Analyses to run:",
+        list(FUSED_ANALYSIS_TYPES),
+        ["Text Extraction (OCR)", "Technical Quality"]
+    )
+    structured = st.checkbox("Structured results", False, key="fused_structured")
+    
+    if not st.button("Analyze Image", type="primary", key="fused_analyze"):
+        return
+    if not selected:
+        st.warning("Choose at least one analysis.")
+        return
+    
+    analysis_keys = [FUSED_ANALYSIS_TYPES[label] for label in selected]
+    with st.spinner("Analyzing image with AI..."):
+        # One upload serves every analysis, so size it for the most demanding one
+        operation = max(analysis_keys, key=lambda key: UPLOAD_MAX_EDGE.get(key, UPLOAD_MAX_EDGE["default"]))
+        image, ingest_stats = normalize_upload(analysis_image, operation)
+        st.caption(format_ingest_stats(ingest_stats))
+        results = analyze_image_fused(image, analysis_keys, hedge=True, structured=structured)
+    
+    report_results = {}
+    for tab, label, key in zip(st.tabs(selected), selected, analysis_keys):
+        result = results[key]
+        with tab:
+            if isinstance(result, str) and result.startswith("Analysis error:"):
+                st.error(result)
+                report_results[key] = result
+            elif isinstance(result, str):
+                st.markdown(result)
+                report_results[key] = result
+            else:
+                render_structured_analysis(result)
+                report_results[key] = result.model_dump()
+    
+    st.download_button(
+        "Download Analysis Report",
+        json.dumps({
+            "analysis_types": selected,
+            "timestamp": datetime.now().isoformat(),
+            "results": report_results
+        }, indent=2),
+        "image_analysis_report.json",
+        "application/json"
+    )
+    
+    extracted = results.get("text_extraction")
+    if extracted is not None and not isinstance(extracted, str):
+        extracted = extracted.extracted_text
+    save_to_history('analysis', {
+        'analysis_type': " + ".join(selected),
+        'timestamp': datetime.now().isoformat(),
+        'success': True
+    }, search_text=extracted if isinstance(extracted, str) else None)
+
+def format_field_name(name):
+    return name.replace('_', ' ').title()
+
+def format_field_value(value):
+    if isinstance(value, list):
+        if value and isinstance(value[0], dict):
+            return "; ".join(", ".join(f"{format_field_name(k)}: {v}" for k, v in item.items()) for item in value)
+        return ", ".join(str(item) for item in value) or "None"
+    return str(value)
+
+def render_structured_analysis(result):
+    """Render a typed analysis result section by section"""
+    for section, value in result.model_dump().items():
+        st.markdown(f"**{format_field_name(section)}:**")
+        if isinstance(value, dict):
+            lines = [f"<b>{format_field_name(key)}:</b> {html.escape(format_field_value(item))}" for key, item in value.items()]
+        elif isinstance(value, list) and value and isinstance(value[0], dict):
+            lines = [html.escape(format_field_value([item])) for item in value]
+        else:
+            lines = [html.escape(format_field_value(value))]
+        st.markdown(f"<div class='analysis-card'>{'<br>'.join(lines)}</div>", unsafe_allow_html=True)
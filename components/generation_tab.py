@@ -2,7 +2,7 @@ import streamlit as st
 import PIL.Image
 from datetime import datetime
 from services.generation_service import generate_image
-from utils.utils import enhance_prompt, save_to_history, create_download_link, convert_to_pil_image
+from utils.utils import enhance_prompt, save_to_history, create_download_link, create_zip_download, get_display_image
 
 def get_style_presets():
     """Get style presets"""
@@ -55,6 +55,7 @@ def render_generation_tab():
         with col1c:
             batch_mode = st.checkbox("Batch Mode", False, help="Generate images from multiple prompts")
             auto_enhance = st.checkbox("Auto-Enhance Prompt", True)
+            use_cache = st.checkbox("Reuse Cached Results", False, help="Serve identical prompts from the result cache instead of calling the API again")
         
         # Batch generation option
         if batch_mode:
@@ -76,22 +77,25 @@ def render_generation_tab():
                     prompts_to_process = [enhanced_prompt]
                 
                 all_images = []
+                image_details = []
                 
                 for i, current_prompt in enumerate(prompts_to_process):
                     with st.spinner(f"Generating images {i+1}/{len(prompts_to_process)}..."):
-                        images, message = generate_image(current_prompt, num_variants)
+                        images, message = generate_image(current_prompt, num_variants, use_cache=use_cache)
                         all_images.extend(images)
+                        image_details.extend({'prompt': current_prompt} for _ in images)
+                        if images and len(images) < num_variants:
+                            st.warning(message)
                 
                 if all_images:
                     st.success(f"Generated {len(all_images)} images successfully!")
                     
                     # Display images in responsive grid
                     if len(all_images) == 1:
-                        # Convert to PIL Image if needed
-                        display_image = convert_to_pil_image(all_images[0])
+                        display_image = get_display_image(all_images[0])
                         if display_image:
                             st.image(display_image, use_container_width=True)
-                            create_download_link(display_image, "generated_image")
+                            create_download_link(all_images[0], "generated_image")
                         else:
                             st.error("Failed to convert image for display")
                     else:
@@ -101,17 +105,25 @@ def render_generation_tab():
                             cols = st.columns(cols_per_row)
                             for j, img in enumerate(all_images[i:i+cols_per_row]):
                                 with cols[j]:
-                                    display_image = convert_to_pil_image(img)
+                                    display_image = get_display_image(img)
                                     if display_image:
                                         st.image(display_image, caption=f"Image {i+j+1}")
-                                        create_download_link(display_image, f"image_{i+j+1}")
+                                        create_download_link(img, f"image_{i+j+1}")
                                     else:
                                         st.error(f"Failed to convert image {i+j+1}")
                     
                     # Batch download option
                     if len(all_images) > 1:
-                        if st.button("Download All as ZIP"):
-                            st.info("ZIP download feature coming soon!")
+                        create_zip_download(all_images, {
+                            'prompt': prompt,
+                            'style': style,
+                            'aspect_ratio': aspect_ratio,
+                            'variants': num_variants,
+                            'quality_boost': quality_boost,
+                            'auto_enhance': auto_enhance,
+                            'batch_mode': batch_mode,
+                            'timestamp': datetime.now().isoformat()
+                        }, "generated_images", image_details)
                     
                     # Save to history
                     save_to_history('generation', {
@@ -120,69 +132,7 @@ def render_generation_tab():
                         'variants': num_variants,
                         'batch_mode': batch_mode,
                         'count': len(all_images)
-                    })
-                else:
-                    st.error("Failed to generate images. Please try again.")
-            else:
-                st.warning("Please enter a description!")
-    
-    with col2:
-        st.markdown("**Quick Templates**")
-        
-        template_categories = {
-            "Professional": [
-                "Business headshot, confident expression",
-                "Corporate team photo, professional attire",
-                "Executive portrait, formal background",
-                "LinkedIn profile photo, approachable smile"
-            ],
-            "Creative": [
-                "Artistic portrait, creative lighting",
-                "Fashion model pose, stylish outfit",
-                "Creative workspace, inspiring environment",
-                "Artistic collaboration, team creativity"
-            ],
-            "Social Media": [
-                "Instagram-ready portrait, trendy style",
-                "Lifestyle photo, casual but polished",
-                "Influencer content, engaging pose",
-                "Story-worthy moment, authentic feel"
-            ],
-            "Character": [
-                "Fantasy character, magical setting",
-                "Superhero pose, dynamic action",
-                "Historical figure, period clothing",
-                "Anime character, vibrant colors"
-            ]
-        }
-        
-        for category, templates in template_categories.items():
-            with st.expander(category):
-                for template in templates:
-                    if st.button(template[:30] + "...", key=f"template_{template[:15]}", help=template):
-                        st.session_state.template_prompt = template
-                        st.rerun()
-                                with cols[j]:
-                                    display_image = convert_to_pil_image(img)
-                                    if display_image:
-                                        st.image(display_image, caption=f"Image {i+j+1}")
-                                        create_download_link(display_image, f"image_{i+j+1}")
-                                    else:
-                                        st.error(f"Failed to convert image {i+j+1}")
-                    
-                    # Batch download option
-                    if len(all_images) > 1:
-                        if st.button("Download All as ZIP"):
-                            st.info("ZIP download feature coming soon!")
-                    
-                    # Save to history
-                    save_to_history('generation', {
-                        'prompt': prompt,
-                        'style': style,
-                        'variants': num_variants,
-                        'batch_mode': batch_mode,
-                        'count': len(all_images)
-                    })
+                    }, images=all_images)
                 else:
                     st.error("Failed to generate images. Please try again.")
             else:
@@ -1,9 +1,15 @@
 import streamlit as st
-import json
+import time
+from config.config import HISTORY_PAGE_SIZE, HISTORY_SEARCH_LIMIT, THUMBNAIL_MAX_EDGE
+from utils.history_store import history_store
+from utils.thumbnail_pack import get_thumbnail_pack
+from utils.utils import get_owner_id
 
 def render_history_tab():
     st.header("Activity History & Smart Templates")
     
+    render_history_search()
+    
     history_tab1, history_tab2, history_tab3, template_tab = st.tabs([
         "Generations", 
         "Transformations", 
@@ -13,54 +19,27 @@ def render_history_tab():
     
     with history_tab1:
         st.subheader("Generation History")
-        if st.session_state.generation_history:
-            for i, item in enumerate(st.session_state.generation_history):
-                with st.expander(f"Generation {i+1} - {item['timestamp']}"):
-                    data = item['data']
-                    st.write(f"**Prompt:** {data.get('prompt', 'N/A')}")
-                    st.write(f"**Style:** {data.get('style', 'None')}")
-                    st.write(f"**Variants:** {data.get('variants', 1)}")
-                    st.write(f"**Images Created:** {data.get('count', 1)}")
-                    
-                    col1, col2 = st.columns(2)
-                    with col1:
-                        if st.button(f"Regenerate", key=f"regen_{i}"):
-                            st.session_state.template_prompt = data.get('prompt', '')
-                            st.info("Prompt copied! Go to Generate tab.")
-                    with col2:
-                        if st.button(f"Copy Prompt", key=f"copy_gen_{i}"):
-                            st.code(data.get('prompt', ''))
-        else:
-            st.info("No generations yet. Create your first image in the Generate tab!")
+        render_history_page(
+            'generation',
+            render_generation_item,
+            "No generations yet. Create your first image in the Generate tab!"
+        )
     
     with history_tab2:
         st.subheader("Transformation History")
-        if st.session_state.edit_history:
-            for i, item in enumerate(st.session_state.edit_history):
-                with st.expander(f"Transform {i+1} - {item['timestamp']}"):
-                    data = item['data']
-                    st.write(f"**Type:** {data.get('edit_type', 'Unknown')}")
-                    st.write(f"**Success:** {'✅' if data.get('success') else '❌'}")
-                    st.write(f"**Timestamp:** {data.get('timestamp', 'N/A')}")
-                    
-                    if st.button(f"View Details", key=f"edit_details_{i}"):
-                        st.json(data.get('options', {}))
-        else:
-            st.info("No transformations yet. Edit your first image in the Transform tab!")
+        render_history_page(
+            'edit',
+            render_edit_item,
+            "No transformations yet. Edit your first image in the Transform tab!"
+        )
     
     with history_tab3:
         st.subheader("Analysis History")
-        if st.session_state.analysis_history:
-            for i, item in enumerate(st.session_state.analysis_history):
-                with st.expander(f"Analysis {i+1} - {item['timestamp']}"):
-                    data = item['data']
-                    st.write(f"**Analysis Type:** {data.get('analysis_type', 'Unknown')}")
-                    st.write(f"**Success:** {'✅' if data.get('success') else '❌'}")
-                    
-                    if st.button(f"Re-run Analysis", key=f"rerun_analysis_{i}"):
-                        st.info("Go to Analysis tab to perform new analysis!")
-        else:
-            st.info("No analysis performed yet. Analyze your first image in the Analysis tab!")
+        render_history_page(
+            'analysis',
+            render_analysis_item,
+            "No analysis performed yet. Analyze your first image in the Analysis tab!"
+        )
     
     with template_tab:
         st.subheader("Smart Templates & Presets")
@@ -108,3 +87,118 @@ def render_history_tab():
                         if st.button("Copy", key=f"template_{category}_{j}", help="Copy to Generate tab"):
                             st.session_state.template_prompt = template
                             st.success("Copied!")
+
+# Search filter choices
+SEARCH_TYPES = {"All": None, "Generations": 'generation', "Transformations": 'edit', "Analysis": 'analysis'}
+SEARCH_PERIODS = {"Any time": None, "Past day": 1, "Past week": 7, "Past month": 30, "Past year": 365}
+ENTRY_LABELS = {'generation': "Generation", 'edit': "Transform", 'analysis': "Analysis"}
+
+def render_history_search():
+    """Ranked full-text search over prompts, edit options and extracted text"""
+    query = st.text_input(
+        "Search history:",
+        key="history_search",
+        placeholder="Prompts, edit options, extracted text..."
+    )
+    
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        item_type = SEARCH_TYPES[st.selectbox("Type:", list(SEARCH_TYPES), key="history_search_type")]
+    with col2:
+        period = SEARCH_PERIODS[st.selectbox("When:", list(SEARCH_PERIODS), key="history_search_period")]
+    with col3:
+        edit_type = None
+        if item_type == 'edit':
+            edit_types = ["All"] + [name for name, _ in history_store.edit_type_counts(get_owner_id())]
+            edit_type = st.selectbox("Transformation:", edit_types, key="history_search_edit_type")
+            edit_type = None if edit_type == "All" else edit_type
+    
+    if not query.strip():
+        return
+    
+    since = time.time() - period * 24 * 60 * 60 if period else None
+    results = history_store.search(get_owner_id(), query, item_type, edit_type, since, limit=HISTORY_SEARCH_LIMIT)
+    if not results:
+        st.info("No matching history.")
+        return
+    
+    st.caption(f"{len(results)} best matches")
+    for item in results:
+        with st.expander(f"{ENTRY_LABELS.get(item['type'], item['type'])} {item['id']} - {item['timestamp']}"):
+            st.markdown(item['snippet'])
+            render_thumbnails(item)
+
+def render_history_page(item_type, render_item, empty_message):
+    """Show one page of history, newest first, with Newer/Older navigation"""
+    # Stack of page cursors (the id each page starts below); None is the newest page
+    cursors = st.session_state.history_pages.setdefault(item_type, [None])
+    
+    # Fetch one extra row to know whether an older page exists
+    items = history_store.page(get_owner_id(), item_type, before_id=cursors[-1], limit=HISTORY_PAGE_SIZE + 1)
+    has_older = len(items) > HISTORY_PAGE_SIZE
+    items = items[:HISTORY_PAGE_SIZE]
+    
+    if not items and len(cursors) == 1:
+        st.info(empty_message)
+        return
+    
+    for item in items:
+        render_item(item)
+    
+    col1, col2, col3 = st.columns([1, 2, 1])
+    with col1:
+        if len(cursors) > 1 and st.button("Newer", key=f"history_newer_{item_type}"):
+            cursors.pop()
+            st.rerun()
+    with col2:
+        st.caption(f"Page {len(cursors)}")
+    with col3:
+        if has_older and st.button("Older", key=f"history_older_{item_type}"):
+            cursors.append(items[-1]['id'])
+            st.rerun()
+
+def render_thumbnails(item):
+    """Show an entry's stored thumbnails, read straight from the pack"""
+    pack = get_thumbnail_pack(item['owner']) if item['thumbnails'] else None
+    thumbnails = [pack.read(offset, length) for offset, length in item['thumbnails']]
+    thumbnails = [data for data in thumbnails if data]
+    if thumbnails:
+        st.image(thumbnails, width=THUMBNAIL_MAX_EDGE)
+
+def render_generation_item(item):
+    with st.expander(f"Generation {item['id']} - {item['timestamp']}"):
+        data = item['data']
+        st.write(f"**Prompt:** {data.get('prompt', 'N/A')}")
+        st.write(f"**Style:** {data.get('style', 'None')}")
+        st.write(f"**Variants:** {data.get('variants', 1)}")
+        st.write(f"**Images Created:** {data.get('count', 1)}")
+        render_thumbnails(item)
+        
+        col1, col2 = st.columns(2)
+        with col1:
+            if st.button(f"Regenerate", key=f"regen_{item['id']}"):
+                st.session_state.template_prompt = data.get('prompt', '')
+                st.info("Prompt copied! Go to Generate tab.")
+        with col2:
+            if st.button(f"Copy Prompt", key=f"copy_gen_{item['id']}"):
+                st.code(data.get('prompt', ''))
+
+def render_edit_item(item):
+    with st.expander(f"Transform {item['id']} - {item['timestamp']}"):
+        data = item['data']
+        st.write(f"**Type:** {data.get('edit_type', 'Unknown')}")
+        st.write(f"**Success:** {'✅' if data.get('success') else '❌'}")
+        st.write(f"**Timestamp:** {data.get('timestamp', 'N/A')}")
+        render_thumbnails(item)
+        
+        if st.button(f"View Details", key=f"edit_details_{item['id']}"):
+            st.json(data.get('options', {}))
+
+def render_analysis_item(item):
+    with st.expander(f"Analysis {item['id']} - {item['timestamp']}"):
+        data = item['data']
+        st.write(f"**Analysis Type:** {data.get('analysis_type', 'Unknown')}")
+        st.write(f"**Success:** {'✅' if data.get('success') else '❌'}")
+        
+        if st.button(f"Re-run Analysis", key=f"rerun_analysis_{item['id']}"):
+            st.info("Go to Analysis tab to perform new analysis!")
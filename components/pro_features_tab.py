@@ -1,10 +1,17 @@
 import streamlit as st
 import json
+import math
 from datetime import datetime
-from services.generation_service import generate_image
-from services.analysis_service import analyze_image_content
-from utils.utils import enhance_prompt, create_download_link, convert_to_pil_image
-import PIL.Image
+from services.client import get_client, rate_limiter, hedger, single_flight, prompt_cache
+from services.retry import retry_stats
+from services.generation_service import generation_cache
+from services.analysis_service import analysis_cache, ANALYSIS_TYPE_LABELS
+from services.editing_service import edit_cache
+from services.batch_service import job_manager, plan_packs
+from services.job_manager import ACTIVE_STATUSES, load_result
+from config.config import JOB_POLL_INTERVAL, JOB_PREVIEW_ITEMS, JOB_RESULTS_PAGE_SIZE
+from utils.history_store import history_store
+from utils.utils import enhance_prompt, build_zip_archive, get_display_image, get_owner_id
 
 def get_style_presets():
     """Get style presets"""
@@ -56,32 +63,32 @@ def render_batch_operations():
         with col2:
             batch_quality = st.checkbox("Quality boost for all", True)
             batch_format = st.selectbox("Output format:", ["PNG", "JPEG", "WEBP"])
+            batch_use_cache = st.checkbox("Reuse cached results", False)
         
         if st.button("Generate Batch Images"):
             if batch_prompts.strip():
                 prompts = [p.strip() for p in batch_prompts.split('\n') if p.strip()]
                 
-                all_results = []
-                progress_bar = st.progress(0)
-                
-                for i, prompt in enumerate(prompts):
-                    enhanced_prompt = enhance_prompt(prompt, batch_style, "Default", batch_quality)
-                    images, _ = generate_image(enhanced_prompt, batch_variants)
-                    all_results.extend(images)
-                    progress_bar.progress((i + 1) / len(prompts))
-                
-                st.success(f"Generated {len(all_results)} images from {len(prompts)} prompts!")
-                
-                # Display batch results
-                cols = st.columns(min(3, len(all_results)))
-                for i, img in enumerate(all_results):
-                    with cols[i % 3]:
-                        display_image = convert_to_pil_image(img)
-                        if display_image:
-                            st.image(display_image, caption=f"Batch {i+1}")
-                            create_download_link(display_image, f"batch_image_{i+1}")
+                # Every prompt x variant pair is an independent task
+                tasks = [
+                    (enhance_prompt(prompt, batch_style, "Default", batch_quality), variant)
+                    for prompt in prompts
+                    for variant in range(batch_variants)
+                ]
+                # Warm the shared client before handing work to the job workers
+                get_client()
+                job_id = job_manager.submit("batch_generation", tasks, {
+                    'style': batch_style,
+                    'variants_per_prompt': batch_variants,
+                    'quality_boost': batch_quality,
+                    'use_cache': batch_use_cache,
+                    'prompts': prompts,
+                }, owner=get_owner_id())
+                st.session_state["batch_job_batch_generation"] = job_id
             else:
                 st.warning("Please enter batch prompts!")
+        
+        render_batch_job("batch_generation")
     
     elif batch_operation == "Batch Analysis":
         st.markdown("**Multiple Image Analysis**")
@@ -89,55 +96,196 @@ def render_batch_operations():
             "Upload multiple images:",
             type=['png', 'jpg', 'jpeg'],
             accept_multiple_files=True,
-            help="Upload up to 10 images for batch analysis"
+            help="Upload images for batch analysis; large batches run in the background"
         )
         
         if uploaded_files:
             analysis_type_batch = st.selectbox(
                 "Analysis Type:",
-                ["Complete Analysis", "Text Extraction", "Quality Assessment", "Business Intelligence"]
+                ["Complete Analysis", "Text Extraction (OCR)", "Technical Quality", "Business Intelligence"]
+            )
+            batch_structured = st.checkbox("Structured results (JSON)", False)
+            batch_packed = st.checkbox(
+                "Pack images into shared requests",
+                False,
+                help="Send several small images per API call, cutting request count and quota use"
             )
             
             if st.button("Analyze All Images"):
-                results = []
-                progress_bar = st.progress(0)
-                
-                for i, file in enumerate(uploaded_files):
-                    image = PIL.Image.open(file)
-                    analysis = analyze_image_content(image, analysis_type_batch.lower().replace(" ", "_"))
-                    results.append({
-                        'filename': file.name,
-                        'analysis': analysis
-                    })
-                    progress_bar.progress((i + 1) / len(uploaded_files))
-                
-                st.success(f"Analyzed {len(results)} images!")
-                
-                # Display batch analysis results
-                for i, result in enumerate(results):
-                    with st.expander(f"{result['filename']} - Analysis"):
-                        st.markdown(result['analysis'])
-                
-                # Export batch results
-                batch_report = {
-                    'analysis_type': analysis_type_batch,
-                    'timestamp': datetime.now().isoformat(),
-                    'results': results
-                }
-                st.download_button(
-                    "Download Batch Report",
-                    json.dumps(batch_report, indent=2),
-                    "batch_analysis_report.json",
-                    "application/json"
-                )
+                get_client()
+                # Upload sizes bound what normalization sends, so packs are planned without decoding
+                job_id = job_manager.submit("batch_analysis", uploaded_files, {
+                    'analysis_type': ANALYSIS_TYPE_LABELS[analysis_type_batch],
+                    'analysis_label': analysis_type_batch,
+                    'structured': batch_structured,
+                    'packed': batch_packed,
+                    'filenames': [file.name for file in uploaded_files],
+                }, packs=plan_packs([file.size for file in uploaded_files]) if batch_packed else None, owner=get_owner_id())
+                st.session_state["batch_job_batch_analysis"] = job_id
+        
+        render_batch_job("batch_analysis")
+
+def format_job_label(job):
+    """One-line summary of a job for the job picker"""
+    created = datetime.fromtimestamp(job['created_at']).strftime('%Y-%m-%d %H:%M:%S')
+    done = job['completed'] + job['failed']
+    return f"{created} - {job['status']} ({done}/{job['total']})"
+
+def render_batch_job(kind):
+    """Pick a recent job of this kind and show its progress and results"""
+    jobs = job_manager.list_jobs(kind, owner=get_owner_id())
+    if not jobs:
+        return
+    
+    st.markdown("**Batch Jobs**")
+    labels = {job['id']: format_job_label(job) for job in jobs}
+    # Jobs outlive the session, so a reconnecting browser can pick its batch back up
+    job_id = st.selectbox(
+        "Job:",
+        list(labels),
+        format_func=labels.get,
+        key=f"batch_job_{kind}"
+    )
+    
+    job = job_manager.get_job(job_id, owner=get_owner_id())
+    if job is None:
+        return
+    if job['status'] in ACTIVE_STATUSES:
+        poll_batch_job(job_id)
+    else:
+        show_batch_job(job)
+
+@st.fragment(run_every=JOB_POLL_INTERVAL)
+def poll_batch_job(job_id):
+    """Refresh a running job's progress without rerunning the whole page"""
+    job = job_manager.get_job(job_id, owner=get_owner_id())
+    if job is None or job['status'] not in ACTIVE_STATUSES:
+        # Full rerun to stop polling and show downloads
+        st.rerun()
+    show_batch_job(job)
+
+def show_batch_job(job):
+    active = job['status'] in ACTIVE_STATUSES
+    done = job['completed'] + job['failed']
+    st.progress(done / job['total'] if job['total'] else 1.0)
+    st.text(f"{job['status'].capitalize()}: {job['completed']} done, {job['failed']} failed, {job['total']} total")
+    
+    if active and st.button("Cancel Job", key=f"cancel_job_{job['id']}"):
+        job_manager.cancel(job['id'], owner=job['owner'])
+        st.info("Cancelling: items already running will finish, the rest are skipped.")
+    
+    if active:
+        # While running, preview the latest results as they arrive
+        items = job_manager.get_items(job['id'], limit=JOB_PREVIEW_ITEMS, latest_first=True)
+    else:
+        items = job_result_page(job)
+    if job['kind'] == "batch_generation":
+        show_generation_job(job, items, active)
+    else:
+        show_analysis_job(job, items, active)
+
+def job_result_page(job):
+    """Every result of a finished job in item order, a page at a time"""
+    pages = max(1, math.ceil((job['completed'] + job['failed']) / JOB_RESULTS_PAGE_SIZE))
+    page = 1
+    if pages > 1:
+        page = st.number_input("Results page:", 1, pages, 1, key=f"job_page_{job['id']}")
+        st.caption(f"Page {page} of {pages}")
+    return job_manager.get_items(job['id'], limit=JOB_RESULTS_PAGE_SIZE, offset=(page - 1) * JOB_RESULTS_PAGE_SIZE)
+
+def show_generation_job(job, items, active):
+    if items:
+        cols = st.columns(min(3, len(items)))
+        for i, item in enumerate(items):
+            with cols[i % 3]:
+                if item['status'] == 'done':
+                    image = load_result(item)
+                    if image is not None:
+                        st.image(get_display_image(image), caption=item['meta'].get('prompt'))
+                else:
+                    st.error(f"Batch {item['item_index'] + 1} failed: {item['error']}")
+    
+    if active:
+        return
+    
+    items = job_manager.get_items(job['id'], statuses=('done',))
+    if items:
+        st.success(f"Generated {len(items)} images from {len(job['params'].get('prompts', []))} prompts!")
+        manifest = {key: job['params'].get(key) for key in ('style', 'variants_per_prompt', 'quality_boost', 'prompts')}
+        manifest['timestamp'] = datetime.fromtimestamp(job['created_at']).isoformat()
+        # Results are read back from disk only when the archive is requested
+        st.download_button(
+            f"Download All as ZIP ({len(items)} images)",
+            lambda: build_zip_archive(
+                (load_result(item) for item in items),
+                manifest,
+                [item['meta'] for item in items],
+                name_prefix="batch_image"
+            ),
+            f"batch_images_{job['id']}.zip",
+            "application/zip",
+            key=f"batch_zip_{job['id']}"
+        )
+
+def load_analysis(item, structured):
+    """Stored analysis of a finished item; structured results are decoded for the report"""
+    analysis = load_result(item)
+    if structured and analysis:
+        return json.loads(analysis)
+    return analysis
+
+def show_analysis_job(job, items, active):
+    filenames = job['params'].get('filenames', [])
+    structured = job['params'].get('structured', False)
+    
+    for item in items:
+        filename = filenames[item['item_index']] if item['item_index'] < len(filenames) else f"Image {item['item_index'] + 1}"
+        with st.expander(f"{filename} - Analysis"):
+            if item['status'] == 'done' and structured:
+                st.json(load_result(item) or "{}")
+            elif item['status'] == 'done':
+                st.markdown(load_result(item) or "")
+            else:
+                st.error(item['error'])
+    
+    if active:
+        return
+    
+    results = []
+    for item in job_manager.get_items(job['id']):
+        index = item['item_index']
+        results.append({
+            'filename': filenames[index] if index < len(filenames) else None,
+            'analysis': load_analysis(item, structured) if item['status'] == 'done' else item['error'],
+            'bytes_uploaded': item['meta'].get('bytes_uploaded'),
+            'bytes_sent': item['meta'].get('bytes_sent')
+        })
+    
+    if results:
+        st.success(f"Analyzed {job['completed']} of {job['total']} images!")
+        
+        # Export batch results
+        batch_report = {
+            'analysis_type': job['params'].get('analysis_label'),
+            'timestamp': datetime.fromtimestamp(job['created_at']).isoformat(),
+            'results': results
+        }
+        st.download_button(
+            "Download Batch Report",
+            json.dumps(batch_report, indent=2),
+            f"batch_analysis_report_{job['id']}.json",
+            "application/json",
+            key=f"batch_report_{job['id']}"
+        )
 
 def render_analytics():
     st.subheader("Usage Analytics & Insights")
     
     # Usage metrics
-    total_generations = len(st.session_state.generation_history)
-    total_edits = len(st.session_state.edit_history)
-    total_analyses = len(st.session_state.analysis_history)
+    counts = history_store.counts(get_owner_id())
+    total_generations = counts.get('generation', 0)
+    total_edits = counts.get('edit', 0)
+    total_analyses = counts.get('analysis', 0)
     total_operations = total_generations + total_edits + total_analyses
     
     # Metrics display
@@ -168,216 +316,87 @@ def render_analytics():
         st.markdown("**Feature Usage Breakdown**")
         
         # Most used features
-        feature_usage = {}
-        for item in st.session_state.edit_history:
-            edit_type = item['data'].get('edit_type', 'Unknown')
-            feature_usage[edit_type] = feature_usage.get(edit_type, 0) + 1
-        
-        if feature_usage:
-            for feature, count in sorted(feature_usage.items(), key=lambda x: x[1], reverse=True):
-                st.write(f"**{feature}:** {count} times")
+        for feature, count in history_store.edit_type_counts(get_owner_id()):
+            st.write(f"**{feature}:** {count} times")
     
     else:
         st.info("Start using the app to see analytics!")
-
-def render_settings():
-    st.subheader("Advanced Settings & Configuration")
-    
-    st.markdown("**Default Generation Settings**")
-    col1, col2 = st.columns(2)
-    
-    with col1:
-        default_style = st.selectbox("Default Style:", list(get_style_presets().keys()), key="default_style")
-        default_quality = st.checkbox("Always use quality boost", True)
-        auto_enhance_prompts = st.checkbox("Auto-enhance all prompts", True)
-    
-    with col2:
-        default_variants = st.slider("Default variants:", 1, 4, 2)
-        save_originals = st.checkbox("Save original images", True)
-        compression_quality = st.slider("Image quality:", 1, 10, 9)
-    
-    st.markdown("**Privacy & Safety Settings**")
-    col3, col4 = st.columns(2)
     
-    with col3:
-        content_safety = st.checkbox("Enhanced content safety", True)
-        watermark_outputs = st.checkbox("Add watermark to outputs", False)
-        save_history = st.checkbox("Save operation history", True)
-    
-    with col4:
-        auto_backup = st.checkbox("Auto-backup results", False)
-        analytics_tracking = st.checkbox("Usage analytics", True)
-        performance_mode = st.selectbox("Performance Mode:", ["Balanced", "Speed", "Quality"])
-    
-    # API usage monitoring
-    st.markdown("**API Usage Monitoring**")
-    st.info("API Credits: Monitor your Google API usage in Google Cloud Console")
-    st.info("Current Limit: Protected from overspending")
-    
-    if st.button("Reset All Settings"):
-        st.warning("This will reset all settings to default values.")
-        if st.button("Confirm Reset"):
-            st.success("Settings reset to defaults!")
+    render_cache_stats()
+    render_api_stats()
 
-def render_pro_features_tab():
-    st.header("Professional Features & Business Tools")
-    
-    pro_tab1, pro_tab2, pro_tab3 = st.tabs(["Batch Operations", "Analytics", "Settings"])
-    
-    with pro_tab1:
-        render_batch_operations()
-    
-    with pro_tab2:
-        render_analytics()
-    
-    with pro_tab3:
-        render_settings()
+def get_result_caches():
+    """Result caches shown in analytics and settings"""
+    return {
+        "Generation": generation_cache,
+        "Analysis": analysis_cache,
+        "Edit": edit_cache,
+    }
 
-def render_batch_operations():
-    st.subheader("Batch Processing")
-    
-    batch_operation = st.selectbox(
-        "Batch Operation Type:",
-        ["Batch Generation", "Batch Editing", "Batch Analysis", "Batch Face Swap"]
-    )
+def format_bytes(num_bytes):
+    """Human readable byte count"""
+    for unit in ["B", "KB", "MB"]:
+        if num_bytes < 1024:
+            return f"{num_bytes:.0f} {unit}"
+        num_bytes /= 1024
+    return f"{num_bytes:.1f} GB"
+
+def render_cache_stats():
+    st.markdown("**Result Cache Performance**")
     
-    if batch_operation == "Batch Generation":
-        st.markdown("**Multiple Prompt Generation**")
-        batch_prompts = st.text_area(
-            "Enter prompts (one per line):",
-            "Professional headshot, business attire\nCasual portrait, outdoor setting\nCreative workspace, inspiring environment",
-            height=150
-        )
-        
-        col1, col2 = st.columns(2)
+    for name, cache in get_result_caches().items():
+        stats = cache.stats()
+        col1, col2, col3, col4 = st.columns(4)
         with col1:
-            batch_style = st.selectbox("Style for all:", ["None"] + list(STYLE_PRESETS.keys()))
-            batch_variants = st.slider("Variants per prompt:", 1, 3, 1)
+            st.metric(f"{name} Hit Rate", f"{stats['hit_rate']:.0%}")
         with col2:
-            batch_quality = st.checkbox("Quality boost for all", True)
-            batch_format = st.selectbox("Output format:", ["PNG", "JPEG", "WEBP"])
-        
-        if st.button("Generate Batch Images"):
-            if batch_prompts.strip():
-                prompts = [p.strip() for p in batch_prompts.split('\n') if p.strip()]
-                
-                all_results = []
-                progress_bar = st.progress(0)
-                
-                for i, prompt in enumerate(prompts):
-                    enhanced_prompt = enhance_prompt(prompt, batch_style, "Default", batch_quality)
-                    images, _ = generate_image(enhanced_prompt, batch_variants)
-                    all_results.extend(images)
-                    progress_bar.progress((i + 1) / len(prompts))
-                
-                st.success(f"Generated {len(all_results)} images from {len(prompts)} prompts!")
-                
-                # Display batch results
-                cols = st.columns(min(3, len(all_results)))
-                for i, img in enumerate(all_results):
-                    with cols[i % 3]:
-                        display_image = convert_to_pil_image(img)
-                        st.image(display_image, caption=f"Batch {i+1}")
-                        create_download_link(display_image, f"batch_image_{i+1}")
-            else:
-                st.warning("Please enter batch prompts!")
-    
-    elif batch_operation == "Batch Analysis":
-        st.markdown("**Multiple Image Analysis**")
-        uploaded_files = st.file_uploader(
-            "Upload multiple images:",
-            type=['png', 'jpg', 'jpeg'],
-            accept_multiple_files=True,
-            help="Upload up to 10 images for batch analysis"
-        )
-        
-        if uploaded_files:
-            analysis_type_batch = st.selectbox(
-                "Analysis Type:",
-                ["Complete Analysis", "Text Extraction", "Quality Assessment", "Business Intelligence"]
-            )
-            
-            if st.button("Analyze All Images"):
-                results = []
-                progress_bar = st.progress(0)
-                
-                for i, file in enumerate(uploaded_files):
-                    image = PIL.Image.open(file)
-                    analysis = analyze_image_content(image, analysis_type_batch.lower().replace(" ", "_"))
-                    results.append({
-                        'filename': file.name,
-                        'analysis': analysis
-                    })
-                    progress_bar.progress((i + 1) / len(uploaded_files))
-                
-                st.success(f"Analyzed {len(results)} images!")
-                
-                # Display batch analysis results
-                for i, result in enumerate(results):
-                    with st.expander(f"{result['filename']} - Analysis"):
-                        st.markdown(result['analysis'])
-                
-                # Export batch results
-                batch_report = {
-                    'analysis_type': analysis_type_batch,
-                    'timestamp': datetime.now().isoformat(),
-                    'results': results
-                }
-                st.download_button(
-                    "Download Batch Report",
-                    json.dumps(batch_report, indent=2),
-                    "batch_analysis_report.json",
-                    "application/json"
-                )
+            st.metric("Hits / Misses", f"{stats['hits']} / {stats['misses']}")
+        with col3:
+            st.metric("Bytes Saved", format_bytes(stats['bytes_saved']))
+        with col4:
+            st.metric("Evictions", stats['evictions'])
 
-def render_analytics():
-    st.subheader("Usage Analytics & Insights")
+def render_api_stats():
+    st.markdown("**API Admission Control**")
     
-    # Usage metrics
-    total_generations = len(st.session_state.generation_history)
-    total_edits = len(st.session_state.edit_history)
-    total_analyses = len(st.session_state.analysis_history)
-    total_operations = total_generations + total_edits + total_analyses
-    
-    # Metrics display
+    stats = rate_limiter.stats()
     col1, col2, col3, col4 = st.columns(4)
-    
     with col1:
-        st.markdown('<div class="metric-card">', unsafe_allow_html=True)
-        st.metric("Total Operations", total_operations)
-        st.markdown('</div>', unsafe_allow_html=True)
-    
+        st.metric("Concurrency Limit", stats['concurrency_limit'])
     with col2:
-        st.markdown('<div class="metric-card">', unsafe_allow_html=True)
-        st.metric("Generations", total_generations)
-        st.markdown('</div>', unsafe_allow_html=True)
-    
+        st.metric("Calls Admitted", stats['admitted'])
     with col3:
-        st.markdown('<div class="metric-card">', unsafe_allow_html=True)
-        st.metric("Transformations", total_edits)
-        st.markdown('</div>', unsafe_allow_html=True)
-    
+        st.metric("Calls Throttled", stats['throttled'])
     with col4:
-        st.markdown('<div class="metric-card">', unsafe_allow_html=True)
-        st.metric("Analyses", total_analyses)
-        st.markdown('</div>', unsafe_allow_html=True)
+        st.metric("Quota Errors (429/503)", stats['overloads'])
     
-    # Usage trends
-    if total_operations > 0:
-        st.markdown("**Feature Usage Breakdown**")
-        
-        # Most used features
-        feature_usage = {}
-        for item in st.session_state.edit_history:
-            edit_type = item['data'].get('edit_type', 'Unknown')
-            feature_usage[edit_type] = feature_usage.get(edit_type, 0) + 1
-        
-        if feature_usage:
-            for feature, count in sorted(feature_usage.items(), key=lambda x: x[1], reverse=True):
-                st.write(f"**{feature}:** {count} times")
+    hedges = hedger.budget.stats()
+    if hedges['hedges']:
+        st.write(
+            f"**Hedged requests:** {hedges['hedges']} duplicates for {hedges['calls']} interactive calls, "
+            f"{hedges['hedge_wins']} finished first, {hedges['denied']} skipped by budget"
+        )
     
-    else:
-        st.info("Start using the app to see analytics!")
+    coalesced = single_flight.stats()
+    if coalesced['shared']:
+        st.write(f"**Coalesced requests:** {coalesced['shared']} of {coalesced['calls']} calls shared an identical in-flight request")
+    
+    prompts = prompt_cache.stats()
+    if prompts['cached_calls'] or prompts['errors'] or prompts['too_short']:
+        st.write(
+            f"**Cached prompts:** {prompts['cached_calls']} calls referenced a cached prompt, "
+            f"{prompts['inline_calls']} sent it inline ({prompts['too_short']} below the cacheable minimum), "
+            f"{prompts['created']} registrations, {prompts['errors']} failed"
+        )
+    
+    retries = retry_stats()
+    if retries:
+        st.markdown("**Retries by Operation**")
+        for operation, counts in sorted(retries.items()):
+            st.write(
+                f"**{operation}:** {counts['calls']} calls, {counts['retries']} retries, "
+                f"{counts['recovered']} recovered, {counts['failed']} failed"
+            )
 
 def render_settings():
     st.subheader("Advanced Settings & Configuration")
@@ -386,7 +405,7 @@ def render_settings():
     col1, col2 = st.columns(2)
     
     with col1:
-        default_style = st.selectbox("Default Style:", list(STYLE_PRESETS.keys()), key="default_style")
+        default_style = st.selectbox("Default Style:", list(get_style_presets().keys()), key="default_style")
         default_quality = st.checkbox("Always use quality boost", True)
         auto_enhance_prompts = st.checkbox("Auto-enhance all prompts", True)
     
@@ -413,6 +432,13 @@ def render_settings():
     st.info("API Credits: Monitor your Google API usage in Google Cloud Console")
     st.info("Current Limit: Protected from overspending")
     
+    # Result cache management
+    st.markdown("**Result Caches**")
+    for name, cache in get_result_caches().items():
+        if st.button(f"Clear {name} Cache", key=f"clear_cache_{name}"):
+            cache.clear()
+            st.success(f"{name} cache cleared!")
+    
     if st.button("Reset All Settings"):
         st.warning("This will reset all settings to default values.")
         if st.button("Confirm Reset"):
@@ -1,5 +1,8 @@
 import streamlit as st
-import json
+from datetime import datetime
+from utils.history_store import history_store
+from utils.thumbnail_pack import get_thumbnail_pack
+from utils.utils import get_owner_id
 
 def render_sidebar():
     """Render sidebar with navigation and stats"""
@@ -7,9 +10,12 @@ def render_sidebar():
         st.title("Dashboard")
         
         # Usage statistics
-        gen_count = len(st.session_state.generation_history)
-        edit_count = len(st.session_state.edit_history)
-        analysis_count = len(st.session_state.analysis_history)
+        owner = get_owner_id()
+        midnight = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        today = history_store.counts(owner, since=midnight.timestamp())
+        gen_count = today.get('generation', 0)
+        edit_count = today.get('edit', 0)
+        analysis_count = today.get('analysis', 0)
         
         st.markdown("**Today's Usage**")
         col1, col2 = st.columns(2)
@@ -24,20 +30,16 @@ def render_sidebar():
         
         # Quick actions
         if st.button("Clear All History"):
-            st.session_state.generation_history = []
-            st.session_state.edit_history = []
-            st.session_state.analysis_history = []
+            history_store.clear(owner)
+            get_thumbnail_pack(owner).clear()
+            st.session_state.history_pages = {}
             st.success("All history cleared!")
         
         if st.button("Export Usage Data"):
-            usage_data = {
-                'generations': st.session_state.generation_history,
-                'edits': st.session_state.edit_history,
-                'analyses': st.session_state.analysis_history
-            }
+            # The report is written from the store only when downloaded
             st.download_button(
                 "Download Usage Report",
-                json.dumps(usage_data, indent=2),
+                lambda: history_store.export_json(owner),
                 "usage_report.json",
                 "application/json"
             )
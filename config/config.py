@@ -1,18 +1,99 @@
 # Configuration file for AI Image Studio Pro
-import streamlit as st
-from google import genai
 
 # Model configuration
 MODEL_ID = "gemini-2.5-flash-image-preview"
 
-@st.cache_resource
-def get_client():
-    """Initialize Gemini client with error handling"""
-    try:
-        api_key = st.secrets["GOOGLE_API_KEY"]
-        return genai.Client(api_key=api_key)
-    except Exception as e:
-        st.error(f"Failed to initialize AI client: {str(e)}")
-        st.stop()
+# Shared API client (services/client.py): request timeout and HTTP connection pool
+CLIENT_TIMEOUT_MS = 120 * 1000
+CLIENT_MAX_CONNECTIONS = 32
+CLIENT_MAX_KEEPALIVE_CONNECTIONS = 16
+CLIENT_KEEPALIVE_EXPIRY = 60
+
+# Process-wide admission control for model calls (services/rate_limiter.py)
+RATE_LIMIT_REQUESTS_PER_MINUTE = 60
+RATE_LIMIT_BURST = 10
+RATE_LIMIT_MAX_CONCURRENCY = 8
+RATE_LIMIT_MIN_CONCURRENCY = 1
+
+# Retries of transient API errors (services/retry.py); deadlines are seconds per operation
+RETRY_MAX_ATTEMPTS = 4
+RETRY_BASE_DELAY = 1.0
+RETRY_MAX_DELAY = 20.0
+RETRY_DEADLINES = {
+    "default": 120,
+    "generation": 180,
+    "edit": 180,
+    "face_swap": 180,
+    "analysis": 90,
+    "analysis_pack": 180,  # up to ANALYSIS_PACK_MAX_IMAGES images per call
+    "analysis_fused": 120,  # several analysis types in one answer
+    "prompt_cache": 30,
+}
+
+# Hedged requests for interactive calls (services/hedging.py): once a call outlives the
+# given latency percentile, fire a duplicate, spending at most HEDGE_BUDGET_RATIO extra calls
+HEDGE_ENABLED = True
+HEDGE_PERCENTILE = 95
+HEDGE_MIN_SAMPLES = 20
+HEDGE_BUDGET_RATIO = 0.05
+HEDGE_BUDGET_BURST = 3
+HEDGE_MAX_WORKERS = 16
+
+# Context caching of the static analysis prompts: registered in the background
+# once per model and referenced by handle. Prompts the provider will not cache
+# are sent inline, and registration of that prompt is retried later.
+PROMPT_CACHE_ENABLED = True
+PROMPT_CACHE_TTL = 3600  # seconds
+PROMPT_CACHE_RETRY_AFTER = 600  # seconds
+# Provider minimum for a cacheable prefix (Gemini 2.5 Flash: 1,024 tokens); shorter prompts always go inline
+PROMPT_CACHE_MIN_TOKENS = 1024
 
 # Style and content options (moved to individual files to avoid circular imports)
+
+# Result cache configuration
+CACHE_DIR = ".cache"
+GENERATION_CACHE_MAX_ENTRIES = 64
+GENERATION_CACHE_MAX_DISK_BYTES = 512 * 1024 * 1024
+GENERATION_CACHE_TTL = 7 * 24 * 60 * 60
+ANALYSIS_CACHE_MAX_ENTRIES = 512
+ANALYSIS_CACHE_MAX_BYTES = 8 * 1024 * 1024
+ANALYSIS_CACHE_MAX_DISK_BYTES = 64 * 1024 * 1024
+ANALYSIS_CACHE_TTL = 30 * 24 * 60 * 60
+EDIT_CACHE_MAX_ENTRIES = 256
+EDIT_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+# Background batch jobs (services/job_manager.py): job table and results live under JOB_DIR
+JOB_DIR = ".cache/jobs"
+JOB_MAX_WORKERS = 6
+JOB_POLL_INTERVAL = 2
+JOB_PREVIEW_ITEMS = 12  # latest results shown while a job runs
+JOB_RESULTS_PAGE_SIZE = 24  # results per page once it has finished
+# Finished jobs and their result files are deleted after JOB_RETENTION_SECONDS,
+# or sooner once more than JOB_MAX_KEPT jobs exist
+JOB_RETENTION_SECONDS = 7 * 24 * 60 * 60
+JOB_MAX_KEPT = 200
+
+# Packed batch analysis: several images per request, bounded by count and bytes sent
+ANALYSIS_PACK_MAX_IMAGES = 8
+ANALYSIS_PACK_MAX_BYTES = 4 * 1024 * 1024
+
+# Persistent operation history (utils/history_store.py)
+HISTORY_DB_PATH = ".cache/history.db"
+HISTORY_PAGE_SIZE = 20
+HISTORY_SEARCH_LIMIT = 50
+THUMBNAIL_DIR = ".cache/thumbnails"  # one pack file per history owner
+THUMBNAIL_OPEN_PACKS = 32
+THUMBNAIL_MAX_EDGE = 128
+THUMBNAIL_JPEG_QUALITY = 75
+
+# Upload normalisation: longest edge (pixels) sent to the model per operation
+UPLOAD_MAX_EDGE = {
+    "default": 2048,
+    "edit": 2048,
+    "face_swap": 1536,
+    "text_extraction": 3072,
+    "complete": 1536,
+    "technical_quality": 1024,
+    "people_demographics": 1536,
+}
+UPLOAD_JPEG_QUALITY = 90
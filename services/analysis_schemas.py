@@ -0,0 +1,129 @@
+from typing import List
+from pydantic import BaseModel, Field
+
+# Response schemas for structured analysis. Field names mirror the sections of
+# the text prompts in analysis_service; scores are integers from 1 to 10.
+
+def score(description):
+    return Field(description=f"{description} (1-10)")
+
+class ContentAnalysis(BaseModel):
+    objects: List[str] = Field(description="Objects, people and animals visible")
+    scene_type: str = Field(description="Indoor/outdoor, location, environment")
+    activities: List[str] = Field(description="What people are doing, actions happening")
+    mood: str = Field(description="Overall atmosphere and feeling")
+
+class QualityScores(BaseModel):
+    resolution_score: int = score("Image sharpness")
+    lighting_quality: int = score("Lighting quality")
+    composition_score: int = score("Photography composition")
+    color_balance: int = score("Color accuracy and harmony")
+    professional_rating: int = score("Overall professional quality")
+
+class PeopleSummary(BaseModel):
+    count: int = Field(description="Number of people visible")
+    demographics: str = Field(description="Age groups, gender distribution")
+    emotions: str = Field(description="Facial expressions, mood")
+    clothing: str = Field(description="Outfit styles, formality level")
+    body_language: str = Field(description="Pose, confidence, energy")
+
+class BusinessIntelligence(BaseModel):
+    commercial_value: int = score("Business usage potential")
+    target_audience: str
+    marketing_effectiveness: int = score("Social media potential")
+    brand_elements: List[str] = Field(description="Logos, brands, products visible")
+    usage_recommendations: List[str] = Field(description="Best platforms and contexts")
+
+class ImprovementSuggestions(BaseModel):
+    technical_fixes: List[str]
+    composition_tips: List[str]
+    enhancement_ideas: List[str]
+
+class CompleteAnalysis(BaseModel):
+    content_analysis: ContentAnalysis
+    technical_quality: QualityScores
+    people_analysis: PeopleSummary
+    business_intelligence: BusinessIntelligence
+    improvement_suggestions: ImprovementSuggestions
+    keywords: List[str] = Field(description="10 relevant tags for this image")
+
+class TextAnalysis(BaseModel):
+    language: str = Field(description="Primary language(s) detected")
+    text_type: str = Field(description="Document, sign, handwritten, printed, display, etc.")
+    structure: str = Field(description="Paragraph, list, table, form, receipt, etc.")
+    quality_score: int = score("Text clarity and readability")
+    business_document_type: str = Field(description="Invoice, receipt, business card, form, or none")
+
+class DataField(BaseModel):
+    field: str
+    value: str
+
+class TextExtraction(BaseModel):
+    text_detected: bool
+    extracted_text: str = Field(description="All visible text exactly as it appears, keeping line breaks")
+    text_analysis: TextAnalysis
+    structured_data: List[DataField] = Field(description="Line items, totals, dates, contact details or form fields")
+    keywords: List[str] = Field(description="Key terms and important phrases")
+    summary: str = Field(description="Brief description of the text content")
+
+class PersonAnalysis(BaseModel):
+    age_group: str
+    expression: str
+    emotion: str
+    eye_contact: str
+    confidence_level: str
+    outfit_style: str
+    formality_level: int = score("Casual to formal")
+
+class PeopleDemographics(BaseModel):
+    people_count: int
+    gender_distribution: str
+    people: List[PersonAnalysis]
+    color_coordination: str = Field(description="How well outfits work together")
+    group_interaction: str = Field(description="How people relate to each other")
+    professional_suitability: int = score("Business usage appropriateness")
+    social_media_ready: int = score("Instagram/LinkedIn readiness")
+
+class ImageQuality(BaseModel):
+    resolution: int = score("Sharpness and detail")
+    exposure: int = score("Brightness and contrast balance")
+    focus: int = score("Subject sharpness and depth")
+    noise_level: int = score("Grain and digital noise")
+
+class Composition(BaseModel):
+    rule_of_thirds: int = score("Composition adherence")
+    balance: int = score("Visual weight distribution")
+    framing: int = score("Subject framing quality")
+    leading_lines: int = score("Use of visual guides")
+
+class Lighting(BaseModel):
+    lighting_direction: str
+    lighting_quality: int = score("Soft/hard light")
+    shadow_detail: int = score("Shadow quality and placement")
+    color_temperature: str
+
+class ColorAnalysis(BaseModel):
+    color_harmony: int = score("How colors work together")
+    saturation: int = score("Color intensity appropriateness")
+    contrast: int = score("Light/dark balance")
+    dominant_colors: List[str]
+
+class ProfessionalAssessment(BaseModel):
+    commercial_readiness: int = score("Ready for business use")
+    improvement_priority: str
+    strengths: List[str]
+    technical_recommendations: List[str]
+
+class TechnicalQuality(BaseModel):
+    image_quality: ImageQuality
+    composition: Composition
+    lighting: Lighting
+    color_analysis: ColorAnalysis
+    professional_assessment: ProfessionalAssessment
+
+ANALYSIS_SCHEMAS = {
+    "complete": CompleteAnalysis,
+    "text_extraction": TextExtraction,
+    "people_demographics": PeopleDemographics,
+    "technical_quality": TechnicalQuality,
+}
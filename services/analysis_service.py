@@ -1,315 +1,516 @@
-import streamlit as st
-from google import genai
+from functools import lru_cache
+from typing import List
+from google.genai import types
+from pydantic import BaseModel, Field, create_model
+from services.client import get_client, generate_content, generate_content_stream, prompt_cache
+from services.retry import is_transient_error
+from services.analysis_schemas import ANALYSIS_SCHEMAS
+from config.config import (
+    MODEL_ID,
+    CACHE_DIR,
+    ANALYSIS_CACHE_MAX_ENTRIES,
+    ANALYSIS_CACHE_MAX_BYTES,
+    ANALYSIS_CACHE_MAX_DISK_BYTES,
+    ANALYSIS_CACHE_TTL,
+)
+from utils.cache import ResultCache, make_cache_key, image_digest
+from utils.image_result import to_content
 
-# Model configuration
-MODEL_ID = "gemini-import streamlit as st
-from google import genai
+# Analysis results are small text, so keep plenty of them in memory and spill to disk
+analysis_cache = ResultCache(
+    "analysis",
+    max_entries=ANALYSIS_CACHE_MAX_ENTRIES,
+    max_bytes=ANALYSIS_CACHE_MAX_BYTES,
+    ttl=ANALYSIS_CACHE_TTL,
+    disk_dir=CACHE_DIR,
+    max_disk_bytes=ANALYSIS_CACHE_MAX_DISK_BYTES,
+)
 
-# Model configuration
-MODEL_ID = "gemini-2.5-flash-image-preview"
+# Bump when ANALYSIS_PROMPTS, STRUCTURED_ANALYSIS_PROMPTS or the schemas change so cached results are not reused
+ANALYSIS_PROMPT_VERSION = 1
 
-@st.cache_resource
-def get_client():
-    """Initialize Gemini client with error handling"""
-    try:
-        api_key = st.secrets["GOOGLE_API_KEY"]
-        return genai.Client(api_key=api_key)
-    except Exception as e:
-        st.error(f"Failed to initialize AI client: {str(e)}")
-        st.stop()
+ANALYSIS_PROMPTS = {
+    "complete": """
+    Provide comprehensive analysis of this image in the following structured format:
+
+    CONTENT_ANALYSIS:
+    - Objects: List all objects, people, animals visible
+    - Scene_Type: Indoor/outdoor, location, environment
+    - Activities: What people are doing, actions happening
+    - Mood: Overall atmosphere and feeling
+
+    TECHNICAL_QUALITY:
+    - Resolution_Score: Rate image sharpness (1-10)
+    - Lighting_Quality: Assess lighting quality (1-10) 
+    - Composition_Score: Photography composition (1-10)
+    - Color_Balance: Color accuracy and harmony (1-10)
+    - Professional_Rating: Overall professional quality (1-10)
+
+    PEOPLE_ANALYSIS:
+    - Count: Number of people visible
+    - Demographics: Age groups, gender distribution
+    - Emotions: Facial expressions, mood analysis
+    - Clothing: Outfit styles, formality level
+    - Body_Language: Pose, confidence, energy
+
+    BUSINESS_INTELLIGENCE:
+    - Commercial_Value: Business usage potential (1-10)
+    - Target_Audience: Who this appeals to
+    - Marketing_Effectiveness: Social media potential (1-10)
+    - Brand_Elements: Any logos, brands, products visible
+    - Usage_Recommendations: Best platforms, contexts
+
+    IMPROVEMENT_SUGGESTIONS:
+    - Technical_Fixes: Specific quality improvements
+    - Composition_Tips: Framing and layout suggestions  
+    - Enhancement_Ideas: Creative improvement options
+
+    KEYWORDS: 10 relevant tags for this image
+    """,
+
+    "text_extraction": """
+    Extract and analyze ALL visible text in this image:
+
+    EXTRACTED_TEXT:
+    [Provide all visible text exactly as it appears, maintaining formatting]
+
+    TEXT_ANALYSIS:
+    - Language: Primary language(s) detected
+    - Text_Type: (document, sign, handwritten, printed, display, etc.)
+    - Structure: (paragraph, list, table, form, receipt, etc.)
+    - Quality_Score: Text clarity and readability (1-10)
+    - Business_Document_Type: (invoice, receipt, business card, form, etc.)
+
+    STRUCTURED_DATA:
+    [If receipt/invoice: extract line items, totals, dates]
+    [If business card: extract name, phone, email, company]
+    [If form: extract field names and values]
+    [If table: organize data in rows and columns]
+
+    KEYWORDS: Key terms and important phrases found
+    SUMMARY: Brief description of text content
+
+    If no text is visible, clearly state "NO TEXT DETECTED"
+    """,
+
+    "people_demographics": """
+    Analyze all people in this image:
+
+    PEOPLE_COUNT: Exact number of people visible
+
+    DEMOGRAPHICS:
+    - Age_Groups: Estimated age ranges for each person
+    - Gender_Distribution: Gender breakdown
+    - Ethnicity_Diversity: Cultural/ethnic representation
+
+    FACIAL_ANALYSIS:
+    - Expressions: Each person's facial expression
+    - Emotions: Mood and emotional state
+    - Eye_Contact: Where people are looking
+    - Confidence_Level: Body language assessment
+
+    CLOTHING_ANALYSIS:
+    - Outfit_Styles: Describe each person's clothing
+    - Formality_Level: Casual to formal rating (1-10)
+    - Color_Coordination: How well outfits work together
+    - Fashion_Era: Modern, vintage, traditional styling
+
+    SOCIAL_DYNAMICS:
+    - Group_Interaction: How people relate to each other
+    - Professional_Suitability: Business usage appropriateness (1-10)
+    - Social_Media_Ready: Instagram/LinkedIn readiness (1-10)
+    """,
+
+    "technical_quality": """
+    Technical photography analysis:
+
+    IMAGE_QUALITY:
+    - Resolution: Image sharpness and detail (1-10)
+    - Exposure: Brightness and contrast balance (1-10) 
+    - Focus: Subject sharpness and depth (1-10)
+    - Noise_Level: Grain and digital noise (1-10)
+
+    COMPOSITION:
+    - Rule_of_Thirds: Composition adherence (1-10)
+    - Balance: Visual weight distribution (1-10)
+    - Framing: Subject framing quality (1-10)
+    - Leading_Lines: Use of visual guides (1-10)
+
+    LIGHTING:
+    - Lighting_Direction: Where light comes from
+    - Lighting_Quality: Soft/hard light assessment (1-10)
+    - Shadow_Detail: Shadow quality and placement (1-10)
+    - Color_Temperature: Warm/cool light balance
+
+    COLOR_ANALYSIS:
+    - Color_Harmony: How colors work together (1-10)
+    - Saturation: Color intensity appropriateness (1-10)
+    - Contrast: Light/dark balance (1-10)
+    - Dominant_Colors: Primary colors in image
+
+    PROFESSIONAL_ASSESSMENT:
+    - Commercial_Readiness: Ready for business use (1-10)
+    - Improvement_Priority: What to fix first
+    - Strengths: What's working well
+    - Technical_Recommendations: Specific fixes needed
+    """
+}
+
+# Short instructions for structured mode; the response schema carries the field list
+STRUCTURED_ANALYSIS_PROMPTS = {
+    "complete": "Provide a comprehensive analysis of this image: content, technical quality, people, business value, improvement suggestions and 10 keywords. Scores are integers from 1 to 10.",
+    "text_extraction": "Extract ALL visible text in this image exactly as it appears and analyze it. If no text is visible, set text_detected to false and leave extracted_text empty.",
+    "people_demographics": "Analyze all people in this image: count, each person's apparent age group, expression, mood and clothing, and how the group interacts. Scores are integers from 1 to 10.",
+    "technical_quality": "Give a technical photography analysis of this image: image quality, composition, lighting, color and a professional assessment. Scores are integers from 1 to 10.",
+}
+
+# Analysis choices shown in the UI and the analysis type each one runs; focuses
+# without a dedicated prompt use the complete analysis
+ANALYSIS_TYPE_LABELS = {
+    "Complete Analysis": "complete",
+    "Text Extraction (OCR)": "text_extraction",
+    "People & Demographics": "people_demographics",
+    "Objects & Brand Detection": "complete",
+    "Technical Quality": "technical_quality",
+    "Business Intelligence": "complete",
+    "Marketing Analysis": "complete",
+    "Content Safety Check": "complete",
+}
+
+def resolve_analysis_type(analysis_type):
+    """Known analysis type, falling back to the complete analysis"""
+    return analysis_type if analysis_type in ANALYSIS_PROMPTS else "complete"
+
+def analysis_cache_key(image, analysis_type, structured=False):
+    """Cache key from the image pixels, resolved analysis type, prompt version and output mode"""
+    parts = [MODEL_ID, image_digest(image), resolve_analysis_type(analysis_type), ANALYSIS_PROMPT_VERSION]
+    if structured:
+        parts.append("structured")
+    return make_cache_key(*parts)
+
+def get_analysis_prompt(analysis_type, structured=False):
+    """Prompt for an analysis type, falling back to the complete analysis"""
+    prompts = STRUCTURED_ANALYSIS_PROMPTS if structured else ANALYSIS_PROMPTS
+    return prompts[resolve_analysis_type(analysis_type)]
+
+def get_analysis_config(analysis_type, structured=False):
+    """JSON mode against the type's response schema, or None for free text"""
+    if not structured:
+        return None
+    return types.GenerateContentConfig(
+        response_mime_type="application/json",
+        response_schema=ANALYSIS_SCHEMAS[resolve_analysis_type(analysis_type)],
+    )
+
+def prompt_cache_key(analysis_type, structured=False):
+    """Key of an analysis prompt in the context cache"""
+    return (resolve_analysis_type(analysis_type), "structured" if structured else "text", ANALYSIS_PROMPT_VERSION)
+
+def build_analysis_request(client, image, analysis_type, structured=False):
+    """Contents and config for one analysis call, plus the prompt cache key it used.
+
+    When the prompt is registered in the context cache the request references
+    it by handle and carries only the image; otherwise the key is None and
+    the prompt is sent inline.
+    """
+    prompt = get_analysis_prompt(analysis_type, structured)
+    config = get_analysis_config(analysis_type, structured)
+    key = prompt_cache_key(analysis_type, structured)
+    handle = prompt_cache.get_handle(client, MODEL_ID, key, prompt)
+    if handle is None:
+        return [prompt, to_content(image)], config, None
+    if config is None:
+        config = types.GenerateContentConfig(cached_content=handle)
+    else:
+        config = config.model_copy(update={'cached_content': handle})
+    return [to_content(image)], config, key
+
+def should_resend_inline(error, prompt_key):
+    """Whether a failed call that referenced a cached prompt should be retried with the prompt inline"""
+    # Expired or deleted cache entries (and handles from another API key) fail permanently
+    return prompt_key is not None and not is_transient_error(error)
+
+def extract_text(response):
+    """Concatenate the text parts of a response"""
+    analysis_text = ""
+    for part in response.parts or []:
+        if part.text:
+            analysis_text += part.text
+    return analysis_text
 
-def analyze_image_content(image, analysis_type):
-    """Comprehensive image analysis and intelligence"""
+def parse_analysis(response, analysis_type, structured=False):
+    """Analysis text, or the typed result in structured mode (None if nothing came back)"""
+    if not structured:
+        return extract_text(response)
+    parsed = response.parsed
+    if isinstance(parsed, BaseModel):
+        return parsed
+    analysis_text = extract_text(response)
+    if not analysis_text:
+        return None
+    return ANALYSIS_SCHEMAS[resolve_analysis_type(analysis_type)].model_validate_json(analysis_text)
+
+def encode_analysis(result):
+    """Cache payload for a text or typed analysis result"""
+    if isinstance(result, BaseModel):
+        return result.model_dump_json().encode('utf-8')
+    return result.encode('utf-8')
+
+def decode_analysis(data, analysis_type, structured=False):
+    """Inverse of encode_analysis"""
+    if structured:
+        return ANALYSIS_SCHEMAS[resolve_analysis_type(analysis_type)].model_validate_json(data)
+    return data.decode('utf-8')
+
+def analyze_image_content(image, analysis_type, use_cache=True, hedge=False, structured=False):
+    """Comprehensive image analysis and intelligence.
+
+    Returns the analysis text, or with structured=True a typed result (see
+    services.analysis_schemas) parsed once from the model's JSON output.
+    """
     try:
+        cache_key = analysis_cache_key(image, analysis_type, structured)
+        if use_cache:
+            cached = analysis_cache.get(cache_key)
+            if cached is not None:
+                return decode_analysis(cached, analysis_type, structured)
+
         client = get_client()
         
-        analysis_prompts = {
-            "complete": """
-            Provide comprehensive analysis of this image in the following structured format:
-            
-            CONTENT_ANALYSIS:
-            - Objects: List all objects, people, animals visible
-            - Scene_Type: Indoor/outdoor, location, environment
-            - Activities: What people are doing, actions happening
-            - Mood: Overall atmosphere and feeling
-            
-            TECHNICAL_QUALITY:
-            - Resolution_Score: Rate image sharpness (1-10)
-            - Lighting_Quality: Assess lighting quality (1-10) 
-            - Composition_Score: Photography composition (1-10)
-            - Color_Balance: Color accuracy and harmony (1-10)
-            - Professional_Rating: Overall professional quality (1-10)
-            
-            PEOPLE_ANALYSIS:
-            - Count: Number of people visible
-            - Demographics: Age groups, gender distribution
-            - Emotions: Facial expressions, mood analysis
-            - Clothing: Outfit styles, formality level
-            - Body_Language: Pose, confidence, energy
-            
-            BUSINESS_INTELLIGENCE:
-            - Commercial_Value: Business usage potential (1-10)
-            - Target_Audience: Who this appeals to
-            - Marketing_Effectiveness: Social media potential (1-10)
-            - Brand_Elements: Any logos, brands, products visible
-            - Usage_Recommendations: Best platforms, contexts
-            
-            IMPROVEMENT_SUGGESTIONS:
-            - Technical_Fixes: Specific quality improvements
-            - Composition_Tips: Framing and layout suggestions  
-            - Enhancement_Ideas: Creative improvement options
-            
-            KEYWORDS: 10 relevant tags for this image
-            """,
-            
-            "text_extraction": """
-            Extract and analyze ALL visible text in this image:
-            
-            EXTRACTED_TEXT:
-            [Provide all visible text exactly as it appears, maintaining formatting]
-            
-            TEXT_ANALYSIS:
-            - Language: Primary language(s) detected
-            - Text_Type: (document, sign, handwritten, printed, display, etc.)
-            - Structure: (paragraph, list, table, form, receipt, etc.)
-            - Quality_Score: Text clarity and readability (1-10)
-            - Business_Document_Type: (invoice, receipt, business card, form, etc.)
-            
-            STRUCTURED_DATA:
-            [If receipt/invoice: extract line items, totals, dates]
-            [If business card: extract name, phone, email, company]
-            [If form: extract field names and values]
-            [If table: organize data in rows and columns]
-            
-            KEYWORDS: Key terms and important phrases found
-            SUMMARY: Brief description of text content
-            
-            If no text is visible, clearly state "NO TEXT DETECTED"
-            """,
-            
-            "people_demographics": """
-            Analyze all people in this image:
-            
-            PEOPLE_COUNT: Exact number of people visible
-            
-            DEMOGRAPHICS:
-            - Age_Groups: Estimated age ranges for each person
-            - Gender_Distribution: Gender breakdown
-            - Ethnicity_Diversity: Cultural/ethnic representation
-            
-            FACIAL_ANALYSIS:
-            - Expressions: Each person's facial expression
-            - Emotions: Mood and emotional state
-            - Eye_Contact: Where people are looking
-            - Confidence_Level: Body language assessment
-            
-            CLOTHING_ANALYSIS:
-            - Outfit_Styles: Describe each person's clothing
-            - Formality_Level: Casual to formal rating (1-10)
-            - Color_Coordination: How well outfits work together
-            - Fashion_Era: Modern, vintage, traditional styling
-            
-            SOCIAL_DYNAMICS:
-            - Group_Interaction: How people relate to each other
-            - Professional_Suitability: Business usage appropriateness (1-10)
-            - Social_Media_Ready: Instagram/LinkedIn readiness (1-10)
-            """,
-            
-            "technical_quality": """
-            Technical photography analysis:
-            
-            IMAGE_QUALITY:
-            - Resolution: Image sharpness and detail (1-10)
-            - Exposure: Brightness and contrast balance (1-10) 
-            - Focus: Subject sharpness and depth (1-10)
-            - Noise_Level: Grain and digital noise (1-10)
-            
-            COMPOSITION:
-            - Rule_of_Thirds: Composition adherence (1-10)
-            - Balance: Visual weight distribution (1-10)
-            - Framing: Subject framing quality (1-10)
-            - Leading_Lines: Use of visual guides (1-10)
-            
-            LIGHTING:
-            - Lighting_Direction: Where light comes from
-            - Lighting_Quality: Soft/hard light assessment (1-10)
-            - Shadow_Detail: Shadow quality and placement (1-10)
-            - Color_Temperature: Warm/cool light balance
-            
-            COLOR_ANALYSIS:
-            - Color_Harmony: How colors work together (1-10)
-            - Saturation: Color intensity appropriateness (1-10)
-            - Contrast: Light/dark balance (1-10)
-            - Dominant_Colors: Primary colors in image
-            
-            PROFESSIONAL_ASSESSMENT:
-            - Commercial_Readiness: Ready for business use (1-10)
-            - Improvement_Priority: What to fix first
-            - Strengths: What's working well
-            - Technical_Recommendations: Specific fixes needed
-            """
-        }
+        contents, config, prompt_key = build_analysis_request(client, image, analysis_type, structured)
         
-        prompt = analysis_prompts.get(analysis_type, analysis_prompts["complete"])
+        try:
+            response = generate_content(
+                client,
+                operation="analysis",
+                request_key=cache_key,
+                hedge=hedge,
+                model=MODEL_ID,
+                contents=contents,
+                config=config
+            )
+        except Exception as e:
+            if not should_resend_inline(e, prompt_key):
+                raise
+            prompt_cache.invalidate(prompt_key)
+            response = generate_content(
+                client,
+                operation="analysis",
+                request_key=cache_key,
+                hedge=hedge,
+                model=MODEL_ID,
+                contents=[get_analysis_prompt(analysis_type, structured), to_content(image)],
+                config=get_analysis_config(analysis_type, structured)
+            )
         
-        response = client.models.generate_content(
-            model=MODEL_ID,
-            contents=[prompt, image]
-        )
+        result = parse_analysis(response, analysis_type, structured)
         
-        analysis_text = ""
-        for part in response.parts:
-            if part.text:
-                analysis_text += part.text
+        if use_cache and result:
+            analysis_cache.put(cache_key, encode_analysis(result))
         
-        return analysis_text
+        return "" if result is None else result
         
     except Exception as e:
         return f"Analysis error: {str(e)}"
-    """Comprehensive image analysis and intelligence"""
+
+def analyze_image_content_stream(image, analysis_type, use_cache=True):
+    """Yield analysis text chunks as the model produces them.
+
+    A cached analysis is yielded whole. The full text is cached once the
+    stream completes; an error ends the stream with an "Analysis error:" chunk.
+    """
+    cache_key = analysis_cache_key(image, analysis_type)
+    if use_cache:
+        cached = analysis_cache.get(cache_key)
+        if cached is not None:
+            yield cached.decode('utf-8')
+            return
+
+    chunks = []
+
+    def stream_text(client, contents, config):
+        for response in generate_content_stream(
+            client,
+            operation="analysis",
+            model=MODEL_ID,
+            contents=contents,
+            config=config
+        ):
+            text = extract_text(response)
+            if text:
+                chunks.append(text)
+                yield text
+
     try:
         client = get_client()
-        
-        analysis_prompts = {
-            "complete": """
-            Provide comprehensive analysis of this image in the following structured format:
-            
-            CONTENT_ANALYSIS:
-            - Objects: List all objects, people, animals visible
-            - Scene_Type: Indoor/outdoor, location, environment
-            - Activities: What people are doing, actions happening
-            - Mood: Overall atmosphere and feeling
-            
-            TECHNICAL_QUALITY:
-            - Resolution_Score: Rate image sharpness (1-10)
-            - Lighting_Quality: Assess lighting quality (1-10) 
-            - Composition_Score: Photography composition (1-10)
-            - Color_Balance: Color accuracy and harmony (1-10)
-            - Professional_Rating: Overall professional quality (1-10)
-            
-            PEOPLE_ANALYSIS:
-            - Count: Number of people visible
-            - Demographics: Age groups, gender distribution
-            - Emotions: Facial expressions, mood analysis
-            - Clothing: Outfit styles, formality level
-            - Body_Language: Pose, confidence, energy
-            
-            BUSINESS_INTELLIGENCE:
-            - Commercial_Value: Business usage potential (1-10)
-            - Target_Audience: Who this appeals to
-            - Marketing_Effectiveness: Social media potential (1-10)
-            - Brand_Elements: Any logos, brands, products visible
-            - Usage_Recommendations: Best platforms, contexts
-            
-            IMPROVEMENT_SUGGESTIONS:
-            - Technical_Fixes: Specific quality improvements
-            - Composition_Tips: Framing and layout suggestions  
-            - Enhancement_Ideas: Creative improvement options
-            
-            KEYWORDS: 10 relevant tags for this image
-            """,
-            
-            "text_extraction": """
-            Extract and analyze ALL visible text in this image:
-            
-            EXTRACTED_TEXT:
-            [Provide all visible text exactly as it appears, maintaining formatting]
-            
-            TEXT_ANALYSIS:
-            - Language: Primary language(s) detected
-            - Text_Type: (document, sign, handwritten, printed, display, etc.)
-            - Structure: (paragraph, list, table, form, receipt, etc.)
-            - Quality_Score: Text clarity and readability (1-10)
-            - Business_Document_Type: (invoice, receipt, business card, form, etc.)
-            
-            STRUCTURED_DATA:
-            [If receipt/invoice: extract line items, totals, dates]
-            [If business card: extract name, phone, email, company]
-            [If form: extract field names and values]
-            [If table: organize data in rows and columns]
-            
-            KEYWORDS: Key terms and important phrases found
-            SUMMARY: Brief description of text content
-            
-            If no text is visible, clearly state "NO TEXT DETECTED"
-            """,
-            
-            "people_demographics": """
-            Analyze all people in this image:
-            
-            PEOPLE_COUNT: Exact number of people visible
-            
-            DEMOGRAPHICS:
-            - Age_Groups: Estimated age ranges for each person
-            - Gender_Distribution: Gender breakdown
-            - Ethnicity_Diversity: Cultural/ethnic representation
-            
-            FACIAL_ANALYSIS:
-            - Expressions: Each person's facial expression
-            - Emotions: Mood and emotional state
-            - Eye_Contact: Where people are looking
-            - Confidence_Level: Body language assessment
-            
-            CLOTHING_ANALYSIS:
-            - Outfit_Styles: Describe each person's clothing
-            - Formality_Level: Casual to formal rating (1-10)
-            - Color_Coordination: How well outfits work together
-            - Fashion_Era: Modern, vintage, traditional styling
-            
-            SOCIAL_DYNAMICS:
-            - Group_Interaction: How people relate to each other
-            - Professional_Suitability: Business usage appropriateness (1-10)
-            - Social_Media_Ready: Instagram/LinkedIn readiness (1-10)
-            """,
-            
-            "technical_quality": """
-            Technical photography analysis:
-            
-            IMAGE_QUALITY:
-            - Resolution: Image sharpness and detail (1-10)
-            - Exposure: Brightness and contrast balance (1-10) 
-            - Focus: Subject sharpness and depth (1-10)
-            - Noise_Level: Grain and digital noise (1-10)
-            
-            COMPOSITION:
-            - Rule_of_Thirds: Composition adherence (1-10)
-            - Balance: Visual weight distribution (1-10)
-            - Framing: Subject framing quality (1-10)
-            - Leading_Lines: Use of visual guides (1-10)
-            
-            LIGHTING:
-            - Lighting_Direction: Where light comes from
-            - Lighting_Quality: Soft/hard light assessment (1-10)
-            - Shadow_Detail: Shadow quality and placement (1-10)
-            - Color_Temperature: Warm/cool light balance
-            
-            COLOR_ANALYSIS:
-            - Color_Harmony: How colors work together (1-10)
-            - Saturation: Color intensity appropriateness (1-10)
-            - Contrast: Light/dark balance (1-10)
-            - Dominant_Colors: Primary colors in image
-            
-            PROFESSIONAL_ASSESSMENT:
-            - Commercial_Readiness: Ready for business use (1-10)
-            - Improvement_Priority: What to fix first
-            - Strengths: What's working well
-            - Technical_Recommendations: Specific fixes needed
-            """
-        }
-        
-        prompt = analysis_prompts.get(analysis_type, analysis_prompts["complete"])
-        
-        response = client.models.generate_content(
-            model=MODEL_ID,
-            contents=[prompt, image]
-        )
-        
-        analysis_text = ""
-        for part in response.parts:
-            if part.text:
-                analysis_text += part.text
-        
-        return analysis_text
-        
+        contents, config, prompt_key = build_analysis_request(client, image, analysis_type)
+        try:
+            yield from stream_text(client, contents, config)
+        except Exception as e:
+            # A rejected cached prompt fails before any text, so the stream can restart inline
+            if chunks or not should_resend_inline(e, prompt_key):
+                raise
+            prompt_cache.invalidate(prompt_key)
+            yield from stream_text(client, [get_analysis_prompt(analysis_type), to_content(image)], None)
     except Exception as e:
-        return f"Analysis error: {str(e)}"
+        yield f"Analysis error: {str(e)}"
+        return
+
+    analysis_text = "".join(chunks)
+    if use_cache and analysis_text:
+        analysis_cache.put(cache_key, analysis_text.encode('utf-8'))
+
+ANALYSIS_PACK_PROMPT = """
+You are given {count} images. Each image is preceded by its label "Image N:".
+Analyze every image independently and return exactly one entry per image, with
+index set to that image's N. Do not mix up or merge images.
+
+Instructions for each image:
+{instructions}
+"""
+
+@lru_cache(maxsize=None)
+def get_pack_schema(analysis_type, structured=False):
+    """Response schema for a packed request: one indexed analysis per image"""
+    analysis_type = resolve_analysis_type(analysis_type)
+    analysis_model = ANALYSIS_SCHEMAS[analysis_type] if structured else str
+    entry = create_model(
+        "PackedAnalysisEntry",
+        index=(int, Field(description="N from the image's 'Image N:' label")),
+        analysis=(analysis_model, ...),
+    )
+    return create_model("PackedAnalysis", results=(List[entry], ...))
+
+def build_pack_contents(images, analysis_type, structured=False):
+    """Instruction followed by a labelled part for each image"""
+    instructions = get_analysis_prompt(analysis_type, structured)
+    contents = [ANALYSIS_PACK_PROMPT.format(count=len(images), instructions=instructions)]
+    for n, image in enumerate(images, 1):
+        contents.extend([f"Image {n}:", to_content(image)])
+    return contents
+
+def parse_pack(response, analysis_type, structured=False):
+    """Map of 1-based image label to its analysis from a packed response"""
+    parsed = response.parsed
+    if not isinstance(parsed, BaseModel):
+        parsed = get_pack_schema(analysis_type, structured).model_validate_json(extract_text(response))
+    return {entry.index: entry.analysis for entry in parsed.results if entry.analysis}
+
+def analyze_image_pack(images, analysis_type, use_cache=True, structured=False):
+    """Analyze several images in one request; returns one (result, error) pair per image, in order.
+
+    Results are cached per image under the same keys as analyze_image_content.
+    Images the packed answer leaves out (or all of them, if the packed call
+    fails) fall back to one request each.
+    """
+    results = [None] * len(images)
+    keys = [analysis_cache_key(image, analysis_type, structured) for image in images]
+    pending = []
+    for i, key in enumerate(keys):
+        cached = analysis_cache.get(key) if use_cache else None
+        if cached is not None:
+            results[i] = (decode_analysis(cached, analysis_type, structured), None)
+        else:
+            pending.append(i)
+
+    answers = {}
+    if len(pending) > 1:
+        try:
+            response = generate_content(
+                get_client(),
+                operation="analysis_pack",
+                model=MODEL_ID,
+                contents=build_pack_contents([images[i] for i in pending], analysis_type, structured),
+                config=types.GenerateContentConfig(
+                    response_mime_type="application/json",
+                    response_schema=get_pack_schema(analysis_type, structured),
+                )
+            )
+            answers = parse_pack(response, analysis_type, structured)
+        except Exception as e:
+            print(f"Packed analysis of {len(pending)} images failed, analyzing individually: {e}")
+
+    for n, i in enumerate(pending, 1):
+        analysis = answers.get(n)
+        if analysis:
+            if use_cache:
+                analysis_cache.put(keys[i], encode_analysis(analysis))
+            results[i] = (analysis, None)
+            continue
+        analysis = analyze_image_content(images[i], analysis_type, use_cache, structured=structured)
+        if isinstance(analysis, str) and analysis.startswith("Analysis error:"):
+            results[i] = (None, analysis)
+        else:
+            results[i] = (analysis, None)
+    return results
+
+ANALYSIS_FUSED_PROMPT = """
+Perform each of the following analyses of this image and return each one in
+its own field of the response, named after the analysis.
+{sections}
+"""
+
+@lru_cache(maxsize=None)
+def get_fused_schema(analysis_types, structured=False):
+    """Response schema with one field per analysis type"""
+    fields = {
+        analysis_type: (ANALYSIS_SCHEMAS[analysis_type] if structured else str, ...)
+        for analysis_type in analysis_types
+    }
+    return create_model("FusedAnalysis", **fields)
+
+def build_fused_prompt(analysis_types, structured=False):
+    sections = "".join(
+        f"\n## {analysis_type}\n{get_analysis_prompt(analysis_type, structured)}\n"
+        for analysis_type in analysis_types
+    )
+    return ANALYSIS_FUSED_PROMPT.format(sections=sections)
+
+def analyze_image_fused(image, analysis_types, use_cache=True, hedge=False, structured=False):
+    """Run several analysis types on one image in a single request.
+
+    Returns {analysis_type: result} with the same values analyze_image_content
+    would return for each type. Every type is cached under its own key, so
+    cached types are skipped and later single analyses reuse these results.
+    """
+    analysis_types = tuple(dict.fromkeys(resolve_analysis_type(t) for t in analysis_types))
+    results = {}
+    pending = []
+    for analysis_type in analysis_types:
+        cached = analysis_cache.get(analysis_cache_key(image, analysis_type, structured)) if use_cache else None
+        if cached is not None:
+            results[analysis_type] = decode_analysis(cached, analysis_type, structured)
+        else:
+            pending.append(analysis_type)
+
+    answers = {}
+    if len(pending) > 1:
+        try:
+            schema = get_fused_schema(tuple(pending), structured)
+            response = generate_content(
+                get_client(),
+                operation="analysis_fused",
+                hedge=hedge,
+                model=MODEL_ID,
+                contents=[build_fused_prompt(pending, structured), to_content(image)],
+                config=types.GenerateContentConfig(
+                    response_mime_type="application/json",
+                    response_schema=schema,
+                )
+            )
+            parsed = response.parsed
+            if not isinstance(parsed, BaseModel):
+                parsed = schema.model_validate_json(extract_text(response))
+            answers = {analysis_type: getattr(parsed, analysis_type) for analysis_type in pending}
+        except Exception as e:
+            print(f"Fused analysis of {', '.join(pending)} failed, analyzing individually: {e}")
+
+    for analysis_type in pending:
+        analysis = answers.get(analysis_type)
+        if analysis:
+            if use_cache:
+                analysis_cache.put(analysis_cache_key(image, analysis_type, structured), encode_analysis(analysis))
+            results[analysis_type] = analysis
+        else:
+            results[analysis_type] = analyze_image_content(image, analysis_type, use_cache, hedge, structured)
+    return {analysis_type: results[analysis_type] for analysis_type in analysis_types}
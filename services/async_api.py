@@ -0,0 +1,209 @@
+import asyncio
+import threading
+from services.client import get_client, generate_content_async, prompt_cache
+from services.generation_service import (
+    MAX_CONCURRENT_VARIANTS,
+    generation_cache,
+    generation_cache_key,
+    get_generation_config,
+    extract_generated_image,
+    summarize_variants,
+)
+from services.editing_service import (
+    edit_cache,
+    edit_cache_key,
+    get_cached_edit,
+    get_edit_config,
+    extract_edit_image,
+    build_edit_prompt,
+    build_face_swap_prompt,
+)
+from services.analysis_service import (
+    analysis_cache,
+    analysis_cache_key,
+    get_analysis_prompt,
+    get_analysis_config,
+    build_analysis_request,
+    should_resend_inline,
+    parse_analysis,
+    encode_analysis,
+    decode_analysis,
+)
+from config.config import MODEL_ID
+from utils.image_result import ImageResult, to_content
+
+# Async versions of the service entry points. They share caches, keys, prompts
+# and return values with the sync functions. Errors are reported the same way,
+# but only Exception is caught, so cancelling the awaiting task still cancels
+# the in-flight request. Cache keys (which hash image pixels) and cache reads
+# and writes (disk I/O) run in worker threads so they never block the loop.
+
+async def generate_variant_async(client, prompt, variant_index=0, use_cache=False):
+    """Generate a single image variant, raising on failure"""
+    cache_key = generation_cache_key(prompt, variant_index)
+    if use_cache:
+        cached = await asyncio.to_thread(generation_cache.get, cache_key)
+        if cached is not None:
+            return ImageResult(cached)
+
+    response = await generate_content_async(
+        client,
+        operation="generation",
+        model=MODEL_ID,
+        contents=prompt,
+        config=get_generation_config()
+    )
+
+    result = extract_generated_image(response)
+    if result is None:
+        raise ValueError("No image returned by the model")
+    if use_cache:
+        await asyncio.to_thread(generation_cache.put, cache_key, result.data)
+    return result
+
+async def generate_image_async(prompt, num_variants=1, max_workers=MAX_CONCURRENT_VARIANTS, use_cache=False):
+    """Generate image(s) from text prompt"""
+    try:
+        client = get_client()
+    except Exception as e:
+        return summarize_variants([(None, str(e))] * num_variants, num_variants)
+
+    semaphore = asyncio.Semaphore(max(1, min(max_workers, num_variants)))
+
+    async def run_variant(variant_index):
+        async with semaphore:
+            try:
+                return await generate_variant_async(client, prompt, variant_index, use_cache), None
+            except Exception as e:
+                return None, str(e)
+
+    variants = await asyncio.gather(*(run_variant(i) for i in range(num_variants)))
+    return summarize_variants(variants, num_variants)
+
+async def face_swap_images_async(source_image, target_image, options):
+    """Advanced face swap between two images"""
+    try:
+        swap_options = {k: v for k, v in options.items() if k != 'source_image'}
+        cache_key = await asyncio.to_thread(edit_cache_key, [source_image, target_image], "face_swap", swap_options)
+        cached = await asyncio.to_thread(get_cached_edit, cache_key)
+        if cached is not None:
+            return cached, "Face swap completed successfully!"
+
+        response = await generate_content_async(
+            get_client(),
+            operation="face_swap",
+            model=MODEL_ID,
+            contents=[build_face_swap_prompt(options), to_content(source_image), to_content(target_image)],
+            config=get_edit_config()
+        )
+
+        result_image = extract_edit_image(response)
+        if result_image:
+            await asyncio.to_thread(edit_cache.put, cache_key, result_image.data)
+            return result_image, "Face swap completed successfully!"
+
+        return None, "Face swap failed to generate result"
+    except Exception as e:
+        return None, f"Face swap error: {str(e)}"
+
+async def advanced_edit_image_async(input_image, edit_type, options):
+    """Enhanced editing with all transformation capabilities"""
+    try:
+        cache_key = await asyncio.to_thread(edit_cache_key, [input_image], edit_type, options)
+        cached = await asyncio.to_thread(get_cached_edit, cache_key)
+        if cached is not None:
+            return cached, "Image transformation completed successfully!"
+
+        response = await generate_content_async(
+            get_client(),
+            operation="edit",
+            model=MODEL_ID,
+            contents=[build_edit_prompt(edit_type, options), to_content(input_image)],
+            config=get_edit_config()
+        )
+
+        result_image = extract_edit_image(response)
+        if result_image:
+            await asyncio.to_thread(edit_cache.put, cache_key, result_image.data)
+            return result_image, "Image transformation completed successfully!"
+
+        return None, "No edited image generated"
+    except Exception as e:
+        return None, f"Editing error: {str(e)}"
+
+async def analyze_image_content_async(image, analysis_type, use_cache=True, structured=False):
+    """Comprehensive image analysis and intelligence"""
+    try:
+        cache_key = await asyncio.to_thread(analysis_cache_key, image, analysis_type, structured)
+        if use_cache:
+            cached = await asyncio.to_thread(analysis_cache.get, cache_key)
+            if cached is not None:
+                return decode_analysis(cached, analysis_type, structured)
+
+        client = get_client()
+        # Prompt registration runs in the background, so this never waits on the provider
+        contents, config, prompt_key = build_analysis_request(client, image, analysis_type, structured)
+        try:
+            response = await generate_content_async(
+                client,
+                operation="analysis",
+                model=MODEL_ID,
+                contents=contents,
+                config=config
+            )
+        except Exception as e:
+            if not should_resend_inline(e, prompt_key):
+                raise
+            prompt_cache.invalidate(prompt_key)
+            response = await generate_content_async(
+                client,
+                operation="analysis",
+                model=MODEL_ID,
+                contents=[get_analysis_prompt(analysis_type, structured), to_content(image)],
+                config=get_analysis_config(analysis_type, structured)
+            )
+
+        result = parse_analysis(response, analysis_type, structured)
+        if use_cache and result:
+            await asyncio.to_thread(analysis_cache.put, cache_key, encode_analysis(result))
+
+        return "" if result is None else result
+    except Exception as e:
+        return f"Analysis error: {str(e)}"
+
+_loop = None
+_loop_lock = threading.Lock()
+
+def get_event_loop():
+    """Long-lived event loop on a daemon thread, so the async HTTP pool survives between sync calls"""
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="async-api", daemon=True).start()
+    return _loop
+
+def run_sync(coro, timeout=None):
+    """Run a coroutine on the shared loop and block for its result; cancels it on timeout or interrupt"""
+    future = asyncio.run_coroutine_threadsafe(coro, get_event_loop())
+    try:
+        return future.result(timeout)
+    except BaseException:
+        future.cancel()
+        raise
+
+def generate_image_sync(prompt, num_variants=1, max_workers=MAX_CONCURRENT_VARIANTS, use_cache=False):
+    """Blocking wrapper around generate_image_async"""
+    return run_sync(generate_image_async(prompt, num_variants, max_workers, use_cache))
+
+def face_swap_images_sync(source_image, target_image, options):
+    """Blocking wrapper around face_swap_images_async"""
+    return run_sync(face_swap_images_async(source_image, target_image, options))
+
+def advanced_edit_image_sync(input_image, edit_type, options):
+    """Blocking wrapper around advanced_edit_image_async"""
+    return run_sync(advanced_edit_image_async(input_image, edit_type, options))
+
+def analyze_image_content_sync(image, analysis_type, use_cache=True, structured=False):
+    """Blocking wrapper around analyze_image_content_async"""
+    return run_sync(analyze_image_content_async(image, analysis_type, use_cache, structured))
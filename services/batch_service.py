@@ -0,0 +1,73 @@
+from config.config import ANALYSIS_PACK_MAX_IMAGES, ANALYSIS_PACK_MAX_BYTES
+from services.client import get_client
+from services.generation_service import generate_variant
+from services.analysis_service import analyze_image_content, analyze_image_pack
+from services.job_manager import job_manager
+from utils.ingest import normalize_upload
+
+def generation_job_worker(item, params):
+    """Background job worker: one (prompt, variant) generation task"""
+    prompt, variant = item
+    image = generate_variant(get_client(), prompt, variant, use_cache=params.get('use_cache', False))
+    return image, {'prompt': prompt, 'variant': variant + 1}
+
+def analysis_job_worker(item, params):
+    """Background job worker: normalize and analyze one uploaded file"""
+    image, ingest_stats = normalize_upload(item, params['analysis_type'])
+    analysis = analyze_image_content(image, params['analysis_type'], structured=params.get('structured', False))
+    if isinstance(analysis, str) and analysis.startswith("Analysis error:"):
+        raise RuntimeError(analysis)
+    if not isinstance(analysis, str):
+        # Typed results are stored as their JSON so the report can embed them as-is
+        analysis = analysis.model_dump_json()
+    return analysis, {
+        'bytes_uploaded': ingest_stats.get('bytes_before'),
+        'bytes_sent': ingest_stats.get('bytes_after'),
+    }
+
+def plan_packs(sizes, max_bytes=ANALYSIS_PACK_MAX_BYTES, max_images=ANALYSIS_PACK_MAX_IMAGES):
+    """Group consecutive items into packs bounded by total bytes and item count.
+
+    Returns lists of item indices; an item larger than the budget gets a pack
+    of its own.
+    """
+    packs, current, current_bytes = [], [], 0
+    for index, size in enumerate(sizes):
+        if current and (len(current) >= max_images or current_bytes + size > max_bytes):
+            packs.append(current)
+            current, current_bytes = [], 0
+        current.append(index)
+        current_bytes += size
+    if current:
+        packs.append(current)
+    return packs
+
+def analysis_pack_job_worker(items, params):
+    """Background pack worker: normalize several uploads and analyze them in one request"""
+    outcomes = [None] * len(items)
+    images, stats, positions = [], [], []
+    for i, item in enumerate(items):
+        try:
+            image, ingest_stats = normalize_upload(item, params['analysis_type'])
+        except Exception as e:
+            outcomes[i] = e
+            continue
+        images.append(image)
+        stats.append(ingest_stats)
+        positions.append(i)
+
+    results = analyze_image_pack(images, params['analysis_type'], structured=params.get('structured', False))
+    for i, ingest_stats, (analysis, error) in zip(positions, stats, results):
+        if error:
+            outcomes[i] = RuntimeError(error)
+            continue
+        if not isinstance(analysis, str):
+            analysis = analysis.model_dump_json()
+        outcomes[i] = (analysis, {
+            'bytes_uploaded': ingest_stats.get('bytes_before'),
+            'bytes_sent': ingest_stats.get('bytes_after'),
+        })
+    return outcomes
+
+job_manager.register("batch_generation", generation_job_worker)
+job_manager.register("batch_analysis", analysis_job_worker, analysis_pack_job_worker)
@@ -0,0 +1,226 @@
+import threading
+import time
+import httpx
+import streamlit as st
+from google import genai
+from google.genai import types
+from config.config import (
+    CLIENT_TIMEOUT_MS,
+    CLIENT_MAX_CONNECTIONS,
+    CLIENT_MAX_KEEPALIVE_CONNECTIONS,
+    CLIENT_KEEPALIVE_EXPIRY,
+    RATE_LIMIT_REQUESTS_PER_MINUTE,
+    RATE_LIMIT_BURST,
+    RATE_LIMIT_MAX_CONCURRENCY,
+    RATE_LIMIT_MIN_CONCURRENCY,
+    RETRY_MAX_ATTEMPTS,
+    RETRY_BASE_DELAY,
+    RETRY_MAX_DELAY,
+    RETRY_DEADLINES,
+    HEDGE_ENABLED,
+    HEDGE_PERCENTILE,
+    HEDGE_MIN_SAMPLES,
+    HEDGE_BUDGET_RATIO,
+    HEDGE_BUDGET_BURST,
+    HEDGE_MAX_WORKERS,
+    PROMPT_CACHE_ENABLED,
+    PROMPT_CACHE_TTL,
+    PROMPT_CACHE_RETRY_AFTER,
+    PROMPT_CACHE_MIN_TOKENS,
+)
+from services.hedging import Hedger
+from services.single_flight import SingleFlight
+from services.prompt_cache import PromptPrefixCache
+from services.rate_limiter import AdaptiveRateLimiter, is_overload_error
+from services.retry import RetryPolicy, call_with_retry, call_with_retry_async
+
+# One client (and one HTTP connection pool) shared by every service and session
+_client = None
+_client_lock = threading.Lock()
+
+# Every model call in the process is admitted through this limiter
+rate_limiter = AdaptiveRateLimiter(
+    requests_per_minute=RATE_LIMIT_REQUESTS_PER_MINUTE,
+    burst=RATE_LIMIT_BURST,
+    max_concurrency=RATE_LIMIT_MAX_CONCURRENCY,
+    min_concurrency=RATE_LIMIT_MIN_CONCURRENCY,
+)
+
+# Tracks per-operation latency and races duplicates of slow interactive calls
+hedger = Hedger(
+    percentile=HEDGE_PERCENTILE,
+    min_samples=HEDGE_MIN_SAMPLES,
+    budget_ratio=HEDGE_BUDGET_RATIO,
+    budget_burst=HEDGE_BUDGET_BURST,
+    max_workers=HEDGE_MAX_WORKERS,
+)
+
+# Identical requests in flight at the same time (from any session) share one call
+single_flight = SingleFlight()
+
+def get_http_options():
+    """HTTP settings for the shared client: timeout and connection pool limits"""
+    limits = httpx.Limits(
+        max_connections=CLIENT_MAX_CONNECTIONS,
+        max_keepalive_connections=CLIENT_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=CLIENT_KEEPALIVE_EXPIRY,
+    )
+    return types.HttpOptions(
+        timeout=CLIENT_TIMEOUT_MS,
+        client_args={'limits': limits},
+        async_client_args={'limits': limits},
+    )
+
+def create_client(api_key):
+    """Build a Gemini client with the tuned connection pool"""
+    return genai.Client(api_key=api_key, http_options=get_http_options())
+
+def get_client():
+    """Return the process-wide Gemini client, creating it on first use"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                try:
+                    _client = create_client(st.secrets["GOOGLE_API_KEY"])
+                except Exception as e:
+                    st.error(f"Failed to initialize AI client: {str(e)}")
+                    st.stop()
+    return _client
+
+def set_client(client):
+    """Replace the shared client, e.g. with a local stand-in for tests or benchmarks.
+
+    Passing None drops the current client so the next get_client() builds a
+    fresh one from the configured API key.
+    """
+    global _client
+    with _client_lock:
+        _client = client
+
+def get_retry_policy(operation):
+    """Retry policy for an operation, using its configured deadline"""
+    return RetryPolicy(
+        max_attempts=RETRY_MAX_ATTEMPTS,
+        base_delay=RETRY_BASE_DELAY,
+        max_delay=RETRY_MAX_DELAY,
+        deadline=RETRY_DEADLINES.get(operation, RETRY_DEADLINES["default"]),
+    )
+
+def with_deadline(kwargs, deadline):
+    """Request kwargs whose HTTP timeout ends no later than deadline (a time.monotonic() value).
+
+    Raises TimeoutError when the operation's retry budget is already spent,
+    e.g. after waiting for a rate limiter slot.
+    """
+    remaining_ms = int((deadline - time.monotonic()) * 1000)
+    if remaining_ms <= 0:
+        raise TimeoutError("Operation deadline exceeded")
+    if remaining_ms >= CLIENT_TIMEOUT_MS:
+        return kwargs
+    config = kwargs.get('config')
+    if config is None:
+        config = types.GenerateContentConfig()
+    elif isinstance(config, dict):
+        config = types.GenerateContentConfig(**config)
+    http_options = config.http_options or types.HttpOptions()
+    http_options = http_options.model_copy(update={'timeout': remaining_ms})
+    return {**kwargs, 'config': config.model_copy(update={'http_options': http_options})}
+
+def generate_content(client=None, operation="default", hedge=False, request_key=None, **kwargs):
+    """Call models.generate_content through the shared rate limiter, retrying transient errors.
+
+    With hedge=True a duplicate request is raced against calls that run past the
+    operation's usual latency; intended for single interactive calls. When a
+    canonical request_key is given, concurrent calls with the same key share
+    a single response.
+    """
+    client = client or get_client()
+
+    def attempt(deadline):
+        with rate_limiter.slot():
+            started = time.monotonic()
+            response = client.models.generate_content(**with_deadline(kwargs, deadline))
+            hedger.latencies.record(operation, time.monotonic() - started)
+            return response
+
+    def call():
+        return call_with_retry(attempt, operation, get_retry_policy(operation))
+
+    def hedged_call():
+        if hedge and HEDGE_ENABLED:
+            return hedger.call(call, operation)
+        return call()
+
+    if request_key is not None:
+        return single_flight.do((operation, request_key), hedged_call)
+    return hedged_call()
+
+
+def generate_content_stream(client=None, operation="default", **kwargs):
+    """Yield models.generate_content_stream chunks, holding a rate limiter slot for the whole stream.
+
+    Transient errors are retried until the first chunk arrives; after that
+    they propagate, since part of the answer has already been handed out. The
+    operation deadline bounds the HTTP timeout of each attempt.
+    """
+    client = client or get_client()
+
+    def attempt(deadline):
+        rate_limiter.acquire()
+        try:
+            chunks = iter(client.models.generate_content_stream(**with_deadline(kwargs, deadline)))
+            first = next(chunks, None)
+        except Exception as e:
+            rate_limiter.release(is_overload_error(e))
+            raise
+        return first, chunks
+
+    first, chunks = call_with_retry(attempt, operation, get_retry_policy(operation))
+    overloaded = False
+    try:
+        if first is not None:
+            yield first
+        yield from chunks
+    except Exception as e:
+        overloaded = is_overload_error(e)
+        raise
+    finally:
+        rate_limiter.release(overloaded)
+
+def create_cached_content(client=None, operation="prompt_cache", **kwargs):
+    """Call caches.create through the shared rate limiter, retrying transient errors"""
+    client = client or get_client()
+
+    def attempt(deadline):
+        with rate_limiter.slot():
+            return client.caches.create(**with_deadline(kwargs, deadline))
+
+    return call_with_retry(attempt, operation, get_retry_policy(operation))
+
+# Long static prompt prefixes registered with the provider's context cache
+prompt_cache = PromptPrefixCache(
+    create=create_cached_content,
+    ttl=PROMPT_CACHE_TTL,
+    retry_after=PROMPT_CACHE_RETRY_AFTER,
+    min_tokens=PROMPT_CACHE_MIN_TOKENS,
+    enabled=PROMPT_CACHE_ENABLED,
+)
+
+async def generate_content_async(client=None, operation="default", **kwargs):
+    """Async counterpart of generate_content using the client's aio surface.
+
+    Shares the rate limiter, retry policy and latency tracking with the sync
+    path. Hedging and request coalescing stay sync-only: callers on an event
+    loop can race or share tasks themselves.
+    """
+    client = client or get_client()
+
+    async def attempt(deadline):
+        async with rate_limiter.slot_async():
+            started = time.monotonic()
+            response = await client.aio.models.generate_content(**with_deadline(kwargs, deadline))
+            hedger.latencies.record(operation, time.monotonic() - started)
+            return response
+
+    return await call_with_retry_async(attempt, operation, get_retry_policy(operation))
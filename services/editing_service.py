@@ -1,146 +1,183 @@
 from google.genai import types
-import streamlit as st
-from google import genai
-import io
 import PIL.Image
+from services.client import get_client, generate_content
+from config.config import MODEL_ID, EDIT_CACHE_MAX_ENTRIES, EDIT_CACHE_MAX_BYTES
+from utils.cache import ResultCache, make_cache_key, image_digest
+from utils.image_result import ImageResult, to_content
 
-# Model configuration
-MODEL_ID = "gemini-2.5-flash-image-preview"
-
-@st.cache_resource
-def get_client():
-    """Initialize Gemini client with error handling"""
-    try:
-        api_key = st.secrets["GOOGLE_API_KEY"]
-        return genai.Client(api_key=api_key)
-    except Exception as e:
-        st.error(f"Failed to initialize AI client: {str(e)}")
-        st.stop()
+# Edit results stored as the encoded bytes returned by the API, evicted LRU by total size
+edit_cache = ResultCache(
+    "edit",
+    max_entries=EDIT_CACHE_MAX_ENTRIES,
+    max_bytes=EDIT_CACHE_MAX_BYTES,
+)
 
 def process_api_image(image_part):
-    """Process image from API response and ensure proper PIL format"""
+    """Wrap image data from an API response part, keeping the original encoded bytes"""
     try:
-        if hasattr(image_part, 'as_image'):
-            img = image_part.as_image()
-            if img:
-                # Ensure proper PIL Image format
-                if not hasattr(img, 'format') or img.format is None:
-                    buf = io.BytesIO()
-                    img.save(buf, format='PNG')
-                    buf.seek(0)
-                    img = PIL.Image.open(buf)
-                    img.format = 'PNG'
-                return img
+        return ImageResult.from_part(image_part)
     except Exception as e:
         print(f"Error processing API image: {e}")
     return None
 
+def canonical_options(options):
+    """JSON-ready copy of options with images replaced by their pixel digest"""
+    canonical = {}
+    for key, value in options.items():
+        if isinstance(value, (PIL.Image.Image, ImageResult)):
+            value = {'image_digest': image_digest(value)}
+        canonical[key] = value
+    return canonical
+
+def edit_cache_key(images, edit_type, options):
+    """Cache key from input image digests, edit type and canonical options"""
+    digests = [image_digest(image) for image in images]
+    return make_cache_key(MODEL_ID, digests, edit_type, canonical_options(options))
+
+def get_cached_edit(cache_key):
+    """Return the cached edit result, or None"""
+    cached = edit_cache.get(cache_key)
+    if cached is None:
+        return None
+    return ImageResult(cached)
+
+def get_edit_config():
+    """Build the request config used for edit and face swap calls"""
+    return types.GenerateContentConfig(
+        safety_settings=[
+            types.SafetySetting(
+                category=types.HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT,
+                threshold=types.HarmBlockThreshold.BLOCK_NONE,
+            )
+        ]
+    )
+
+def extract_edit_image(response):
+    """First image in a response, or None"""
+    for part in response.parts or []:
+        result_image = process_api_image(part)
+        if result_image:
+            return result_image
+    return None
+
+def build_face_swap_prompt(options):
+    """Build detailed face swap prompt"""
+    prompt = f"""
+    Perform a precise face swap operation:
+
+    TASK: Take the face from the first image and naturally place it on the person in the second image
+
+    REQUIREMENTS:
+    - Keep target person's exact body, clothing, pose, and background
+    - Swap only the facial features (eyes, nose, mouth, face shape)
+    - Match skin tone and lighting naturally
+    - Preserve target's hairstyle unless specified
+    - Ensure proper face size and angle alignment
+    - Create seamless, realistic integration
+    - Maintain image quality and resolution
+
+    QUALITY SETTINGS:
+    - Blend mode: {options.get('blend_quality', 'natural')}
+    - Skin tone matching: {options.get('skin_match', 'automatic')}
+    - Hair preservation: {options.get('preserve_hair', True)}
+    - Expression: {options.get('expression', 'keep target expression')}
+
+    Make it look completely natural and professional.
+    """
+    return prompt
+
+def build_edit_prompt(edit_type, options):
+    """Build specific prompts for different edit types"""
+    if edit_type == "outfit_change":
+        prompt = f"Change the person's clothing to {options['clothing']}, keep same person, face, pose and background. {options.get('additional', '')}"
+
+    elif edit_type == "pose_change":
+        prompt = f"Modify the person's pose to {options['pose']} with {options['expression']} facial expression. Keep same person, clothing, and background."
+
+    elif edit_type == "face_enhancement":
+        prompt = f"Enhance the person's face: {options['enhancement']}. Keep everything else exactly the same. Make it look natural and professional."
+
+    elif edit_type == "body_modification":
+        prompt = f"Modify the person's body: {options['modification']}. Keep face, clothing style, and background the same. Make it look natural and realistic."
+
+    elif edit_type == "background_change":
+        prompt = f"Change the background to {options['background']}. Keep the person(s) exactly the same with proper lighting and shadows."
+
+    elif edit_type == "object_control":
+        if options['action'] == 'remove':
+            prompt = f"Remove {options['object']} from the image. Fill the space naturally with appropriate background."
+        elif options['action'] == 'add':
+            prompt = f"Add {options['object']} to the image in a natural way that fits the scene and lighting."
+        else:
+            prompt = f"Replace {options['old_object']} with {options['new_object']} naturally in the scene."
+
+    elif edit_type == "complete_makeover":
+        prompt = f"Complete transformation: change clothing to {options['clothing']}, modify pose to {options['pose']}, enhance face with {options['face_enhancement']}, expression to {options['expression']}. Keep same person and background."
+
+    elif edit_type == "style_transfer":
+        prompt = f"Transform this image to {options['style']} style while maintaining all subjects and composition."
+
+    else:  # custom edit
+        prompt = options.get('custom_prompt', 'Enhance this image professionally')
+    
+    return prompt
+
 def face_swap_images(source_image, target_image, options):
     """Advanced face swap between two images"""
     try:
-        client = get_client()
-        
-        # Build detailed face swap prompt
-        prompt = f"""
-        Perform a precise face swap operation:
+        # The source image travels separately, so key on its digest rather than the options entry
+        swap_options = {k: v for k, v in options.items() if k != 'source_image'}
+        cache_key = edit_cache_key([source_image, target_image], "face_swap", swap_options)
+        cached = get_cached_edit(cache_key)
+        if cached is not None:
+            return cached, "Face swap completed successfully!"
         
-        TASK: Take the face from the first image and naturally place it on the person in the second image
-        
-        REQUIREMENTS:
-        - Keep target person's exact body, clothing, pose, and background
-        - Swap only the facial features (eyes, nose, mouth, face shape)
-        - Match skin tone and lighting naturally
-        - Preserve target's hairstyle unless specified
-        - Ensure proper face size and angle alignment
-        - Create seamless, realistic integration
-        - Maintain image quality and resolution
-        
-        QUALITY SETTINGS:
-        - Blend mode: {options.get('blend_quality', 'natural')}
-        - Skin tone matching: {options.get('skin_match', 'automatic')}
-        - Hair preservation: {options.get('preserve_hair', True)}
-        - Expression: {options.get('expression', 'keep target expression')}
-        
-        Make it look completely natural and professional.
-        """
+        client = get_client()
+        prompt = build_face_swap_prompt(options)
         
-        response = client.models.generate_content(
+        response = generate_content(
+            client,
+            operation="face_swap",
+            request_key=cache_key,
             model=MODEL_ID,
-            contents=[prompt, source_image, target_image],
-            config=types.GenerateContentConfig(
-                safety_settings=[
-                    types.SafetySetting(
-                        category=types.HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT,
-                        threshold=types.HarmBlockThreshold.BLOCK_NONE,
-                    )
-                ]
-            )
+            contents=[prompt, to_content(source_image), to_content(target_image)],
+            config=get_edit_config()
         )
         
-        for part in response.parts:
-            result_image = process_api_image(part)
-            if result_image:
-                return result_image, "Face swap completed successfully!"
+        result_image = extract_edit_image(response)
+        if result_image:
+            edit_cache.put(cache_key, result_image.data)
+            return result_image, "Face swap completed successfully!"
         
         return None, "Face swap failed to generate result"
     except Exception as e:
         return None, f"Face swap error: {str(e)}"
 
-def advanced_edit_image(input_image, edit_type, options):
+def advanced_edit_image(input_image, edit_type, options, hedge=False):
     """Enhanced editing with all transformation capabilities"""
     try:
-        client = get_client()
+        cache_key = edit_cache_key([input_image], edit_type, options)
+        cached = get_cached_edit(cache_key)
+        if cached is not None:
+            return cached, "Image transformation completed successfully!"
         
-        # Build specific prompts for different edit types
-        if edit_type == "outfit_change":
-            prompt = f"Change the person's clothing to {options['clothing']}, keep same person, face, pose and background. {options.get('additional', '')}"
-            
-        elif edit_type == "pose_change":
-            prompt = f"Modify the person's pose to {options['pose']} with {options['expression']} facial expression. Keep same person, clothing, and background."
-            
-        elif edit_type == "face_enhancement":
-            prompt = f"Enhance the person's face: {options['enhancement']}. Keep everything else exactly the same. Make it look natural and professional."
-            
-        elif edit_type == "body_modification":
-            prompt = f"Modify the person's body: {options['modification']}. Keep face, clothing style, and background the same. Make it look natural and realistic."
-            
-        elif edit_type == "background_change":
-            prompt = f"Change the background to {options['background']}. Keep the person(s) exactly the same with proper lighting and shadows."
-            
-        elif edit_type == "object_control":
-            if options['action'] == 'remove':
-                prompt = f"Remove {options['object']} from the image. Fill the space naturally with appropriate background."
-            elif options['action'] == 'add':
-                prompt = f"Add {options['object']} to the image in a natural way that fits the scene and lighting."
-            else:
-                prompt = f"Replace {options['old_object']} with {options['new_object']} naturally in the scene."
-                
-        elif edit_type == "complete_makeover":
-            prompt = f"Complete transformation: change clothing to {options['clothing']}, modify pose to {options['pose']}, enhance face with {options['face_enhancement']}, expression to {options['expression']}. Keep same person and background."
-            
-        elif edit_type == "style_transfer":
-            prompt = f"Transform this image to {options['style']} style while maintaining all subjects and composition."
-            
-        else:  # custom edit
-            prompt = options.get('custom_prompt', 'Enhance this image professionally')
+        client = get_client()
+        prompt = build_edit_prompt(edit_type, options)
         
-        response = client.models.generate_content(
+        response = generate_content(
+            client,
+            operation="edit",
+            request_key=cache_key,
+            hedge=hedge,
             model=MODEL_ID,
-            contents=[prompt, input_image],
-            config=types.GenerateContentConfig(
-                safety_settings=[
-                    types.SafetySetting(
-                        category=types.HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT,
-                        threshold=types.HarmBlockThreshold.BLOCK_NONE,
-                    )
-                ]
-            )
+            contents=[prompt, to_content(input_image)],
+            config=get_edit_config()
         )
         
-        for part in response.parts:
-            result_image = process_api_image(part)
-            if result_image:
-                return result_image, "Image transformation completed successfully!"
+        result_image = extract_edit_image(response)
+        if result_image:
+            edit_cache.put(cache_key, result_image.data)
+            return result_image, "Image transformation completed successfully!"
         
         return None, "No edited image generated"
     except Exception as e:
@@ -1,64 +1,112 @@
 from google.genai import types
-import streamlit as st
-from google import genai
-import io
-import PIL.Image
+from concurrent.futures import ThreadPoolExecutor
+from services.client import get_client, generate_content
+from config.config import (
+    MODEL_ID,
+    CACHE_DIR,
+    GENERATION_CACHE_MAX_ENTRIES,
+    GENERATION_CACHE_MAX_DISK_BYTES,
+    GENERATION_CACHE_TTL,
+)
+from utils.cache import ResultCache, make_cache_key
+from utils.image_result import ImageResult
 
-# Model configuration
-MODEL_ID = "gemini-2.5-flash-image-preview"
+# Maximum number of variants requested from the API at the same time
+MAX_CONCURRENT_VARIANTS = 4
 
-@st.cache_resource
-def get_client():
-    """Initialize Gemini client with error handling"""
-    try:
-        api_key = st.secrets["GOOGLE_API_KEY"]
-        return genai.Client(api_key=api_key)
-    except Exception as e:
-        st.error(f"Failed to initialize AI client: {str(e)}")
-        st.stop()
+# Opt-in cache of generated images, stored as the encoded bytes returned by the API
+generation_cache = ResultCache(
+    "generation",
+    max_entries=GENERATION_CACHE_MAX_ENTRIES,
+    ttl=GENERATION_CACHE_TTL,
+    disk_dir=CACHE_DIR,
+    max_disk_bytes=GENERATION_CACHE_MAX_DISK_BYTES,
+)
 
-def generate_image(prompt, num_variants=1):
-    """Generate image(s) from text prompt"""
+def get_generation_config():
+    """Build the request config used for every generation call"""
+    return types.GenerateContentConfig(
+        safety_settings=[
+            types.SafetySetting(
+                category=types.HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT,
+                threshold=types.HarmBlockThreshold.BLOCK_NONE,
+            )
+        ],
+        response_modalities=['Text', 'Image']
+    )
+
+def generation_cache_key(prompt, variant_index):
+    """Cache key for one variant of a final (already enhanced) prompt"""
+    config = get_generation_config().model_dump(mode='json', exclude_none=True)
+    return make_cache_key(MODEL_ID, prompt, variant_index, config)
+
+def invalidate_generation_cache(prompt, num_variants=1):
+    """Drop cached variants of a prompt so the next request hits the API"""
+    for i in range(num_variants):
+        generation_cache.invalidate(generation_cache_key(prompt, i))
+
+def extract_generated_image(response):
+    """First image in a response as an ImageResult, or None"""
+    # Keep the encoded bytes from the response; pixels are decoded lazily
+    for part in response.parts or []:
+        result = ImageResult.from_part(part)
+        if result:
+            return result
+    return None
+
+def generate_variant(client, prompt, variant_index=0, use_cache=False):
+    """Generate a single image variant, raising on failure"""
+    cache_key = generation_cache_key(prompt, variant_index)
+    if use_cache:
+        cached = generation_cache.get(cache_key)
+        if cached is not None:
+            return ImageResult(cached)
+
+    response = generate_content(
+        client,
+        operation="generation",
+        request_key=cache_key,
+        model=MODEL_ID,
+        contents=prompt,
+        config=get_generation_config()
+    )
+
+    result = extract_generated_image(response)
+    if result is None:
+        raise ValueError("No image returned by the model")
+    if use_cache:
+        generation_cache.put(cache_key, result.data)
+    return result
+
+def generate_image_variants(prompt, num_variants=1, max_workers=MAX_CONCURRENT_VARIANTS, use_cache=False):
+    """Generate variants concurrently; returns one (image, error) pair per variant, in order"""
     try:
         client = get_client()
-        results = []
-        
-        for i in range(num_variants):
-            response = client.models.generate_content(
-                model=MODEL_ID,
-                contents=prompt,
-                config=types.GenerateContentConfig(
-                    safety_settings=[
-                        types.SafetySetting(
-                            category=types.HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT,
-                            threshold=types.HarmBlockThreshold.BLOCK_NONE,
-                        )
-                    ],
-                    response_modalities=['Text', 'Image']
-                )
-            )
-            
-            # Process the response more carefully
-            for part in response.parts:
-                if hasattr(part, 'as_image'):
-                    try:
-                        # Get the image from the response
-                        img = part.as_image()
-                        if img:
-                            # Convert to proper PIL Image with format attribute
-                            if not hasattr(img, 'format') or img.format is None:
-                                # Save to buffer and reload to ensure proper format
-                                buf = io.BytesIO()
-                                img.save(buf, format='PNG')
-                                buf.seek(0)
-                                img = PIL.Image.open(buf)
-                                img.format = 'PNG'  # Explicitly set format
-                            results.append(img)
-                            break
-                    except Exception as e:
-                        print(f"Error processing image part: {e}")
-                        continue
-        
-        return results, "Images generated successfully!"
     except Exception as e:
-        return [], f"Generation error: {str(e)}"
+        return [(None, str(e))] * num_variants
+
+    def run_variant(variant_index):
+        try:
+            return generate_variant(client, prompt, variant_index, use_cache), None
+        except Exception as e:
+            return None, str(e)
+
+    workers = max(1, min(max_workers, num_variants))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(run_variant, range(num_variants)))
+
+def summarize_variants(variants, num_variants):
+    """Collapse per-variant (image, error) pairs into (results, message)"""
+    results = [img for img, _ in variants if img is not None]
+    errors = [f"variant {i+1}: {error}" for i, (_, error) in enumerate(variants) if error]
+
+    if not errors:
+        return results, "Images generated successfully!"
+    if results:
+        return results, f"Generated {len(results)}/{num_variants} images. Failed " + "; ".join(errors)
+    return [], "Generation error: " + "; ".join(errors)
+
+def generate_image(prompt, num_variants=1, max_workers=MAX_CONCURRENT_VARIANTS, use_cache=False):
+    """Generate image(s) from text prompt"""
+    variants = generate_image_variants(prompt, num_variants, max_workers, use_cache)
+    return summarize_variants(variants, num_variants)
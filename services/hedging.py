@@ -0,0 +1,119 @@
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+class LatencyTracker:
+    """Rolling window of successful call latencies per operation"""
+
+    def __init__(self, window=200):
+        self.window = window
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def record(self, operation, seconds):
+        with self._lock:
+            self._samples.setdefault(operation, deque(maxlen=self.window)).append(seconds)
+
+    def percentile(self, operation, percentile, min_samples):
+        """Latency at the given percentile, or None until enough samples exist"""
+        with self._lock:
+            samples = sorted(self._samples.get(operation, ()))
+        if len(samples) < min_samples:
+            return None
+        index = min(len(samples) - 1, int(len(samples) * percentile / 100))
+        return samples[index]
+
+class HedgeBudget:
+    """Caps duplicate calls to a fraction of primary calls.
+
+    Every primary call earns ``ratio`` of a token (up to ``burst``) and every
+    hedge spends a whole one, so extra load stays near ``ratio`` over time.
+    """
+
+    def __init__(self, ratio, burst):
+        self.ratio = ratio
+        self.burst = burst
+        self._tokens = float(burst)
+        self._lock = threading.Lock()
+        self._stats = {'calls': 0, 'hedges': 0, 'hedge_wins': 0, 'denied': 0}
+
+    def on_call(self):
+        with self._lock:
+            self._stats['calls'] += 1
+            self._tokens = min(self.burst, self._tokens + self.ratio)
+
+    def try_spend(self):
+        with self._lock:
+            if self._tokens >= 1:
+                self._tokens -= 1
+                self._stats['hedges'] += 1
+                return True
+            self._stats['denied'] += 1
+            return False
+
+    def on_hedge_win(self):
+        with self._lock:
+            self._stats['hedge_wins'] += 1
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats)
+
+def run_in_thread(fn):
+    """Start fn() on its own daemon thread and return a Future for its result"""
+    future = Future()
+
+    def run():
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(fn())
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=run, name="hedge-primary", daemon=True).start()
+    return future
+
+class Hedger:
+    """Fires a duplicate of a slow call and returns whichever finishes first.
+
+    The primary call starts immediately on its own thread (or on the caller's
+    thread when there is no latency history yet). Only duplicates use the
+    bounded pool, so a pool busy with abandoned losers never delays primaries.
+    """
+
+    def __init__(self, percentile, min_samples, budget_ratio, budget_burst, max_workers):
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.latencies = LatencyTracker()
+        self.budget = HedgeBudget(budget_ratio, budget_burst)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="hedge")
+
+    def hedge_delay(self, operation):
+        return self.latencies.percentile(operation, self.percentile, self.min_samples)
+
+    def call(self, fn, operation):
+        """Run fn(); if it outlives the operation's latency percentile, race a duplicate"""
+        self.budget.on_call()
+        delay = self.hedge_delay(operation)
+        if delay is None:
+            return fn()
+        primary = run_in_thread(fn)
+
+        done, _ = wait([primary], timeout=delay)
+        if done or not self.budget.try_spend():
+            return primary.result()
+
+        hedge = self._executor.submit(fn)
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is hedge:
+                        self.budget.on_hedge_win()
+                    # The slower call keeps running in the background; its result is discarded
+                    return future.result()
+                error = future.exception()
+        raise error
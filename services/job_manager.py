@@ -0,0 +1,273 @@
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from config.config import JOB_DIR, JOB_MAX_WORKERS, JOB_RETENTION_SECONDS, JOB_MAX_KEPT
+from utils.image_result import ImageResult
+
+# Job states; a job that was queued or running when the process stopped is marked interrupted
+ACTIVE_STATUSES = ('queued', 'running')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    owner TEXT,
+    status TEXT NOT NULL,
+    total INTEGER NOT NULL,
+    completed INTEGER NOT NULL DEFAULT 0,
+    failed INTEGER NOT NULL DEFAULT 0,
+    params TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_created_at ON jobs (created_at);
+CREATE TABLE IF NOT EXISTS job_items (
+    job_id TEXT NOT NULL,
+    item_index INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    result_path TEXT,
+    error TEXT,
+    meta TEXT,
+    finished_at REAL,
+    PRIMARY KEY (job_id, item_index)
+);
+"""
+
+class JobManager:
+    """Runs batch jobs on a process-wide worker pool, independent of any script run.
+
+    Job and item state lives in a SQLite table and each finished item's result
+    is written to ``results_dir/<job_id>/`` straight away, so a Streamlit rerun
+    or a dropped browser connection only detaches the UI from a job. Job kinds
+    are registered with a worker ``fn(item, params) -> (result, meta)`` where
+    result is an ImageResult or text.
+
+    Every job belongs to the owner that submitted it, and the listing and
+    lookup methods only return that owner's jobs. Finished jobs are deleted
+    (rows and result files) once they are older than ``retention`` seconds
+    or fall outside the newest ``max_kept`` jobs.
+    """
+
+    def __init__(self, results_dir, max_workers, retention=None, max_kept=None):
+        self.results_dir = results_dir
+        os.makedirs(results_dir, exist_ok=True)
+        self._db_path = os.path.join(results_dir, "jobs.db")
+        self.retention = retention
+        self.max_kept = max_kept
+        self._db_lock = threading.Lock()
+        self._workers = {}
+        self._cancel_events = {}
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        with self._connect() as db:
+            db.executescript(SCHEMA)
+            columns = {row['name'] for row in db.execute("PRAGMA table_info(jobs)")}
+            if 'owner' not in columns:
+                db.execute("ALTER TABLE jobs ADD COLUMN owner TEXT")
+            db.execute("CREATE INDEX IF NOT EXISTS jobs_owner_kind ON jobs (owner, kind, created_at)")
+            db.execute(
+                "UPDATE jobs SET status = 'interrupted', updated_at = ? WHERE status IN (?, ?)",
+                (time.time(), *ACTIVE_STATUSES),
+            )
+        self.prune()
+
+    def _connect(self):
+        db = sqlite3.connect(self._db_path, timeout=30)
+        db.row_factory = sqlite3.Row
+        db.execute("PRAGMA journal_mode=WAL")
+        return db
+
+    def _write(self, sql, params=()):
+        with self._db_lock, self._connect() as db:
+            db.execute(sql, params)
+
+    def register(self, kind, worker, pack_worker=None):
+        """Register the worker function for a job kind.
+
+        A pack_worker ``fn(items, params)`` handles several items in one call
+        and returns one (result, meta) pair or Exception per item, in order;
+        packs of a single item always go to the per-item worker.
+        """
+        self._workers[kind] = (worker, pack_worker)
+
+    def submit(self, kind, items, params=None, packs=None, owner=None):
+        """Queue one job over items for owner and return its ID immediately.
+
+        packs optionally groups item indices; each group goes to the kind's
+        pack worker in a single call. Results are still stored per item.
+        """
+        self.prune()
+        worker, pack_worker = self._workers[kind]
+        items = list(items)
+        params = params or {}
+        if packs is None or pack_worker is None:
+            packs = [[i] for i in range(len(items))]
+        job_id = uuid.uuid4().hex[:12]
+        now = time.time()
+        with self._db_lock, self._connect() as db:
+            db.execute(
+                "INSERT INTO jobs (id, kind, owner, status, total, params, created_at, updated_at) VALUES (?, ?, ?, 'queued', ?, ?, ?, ?)",
+                (job_id, kind, owner, len(items), json.dumps(params, default=str), now, now),
+            )
+            db.executemany(
+                "INSERT INTO job_items (job_id, item_index, status) VALUES (?, ?, 'queued')",
+                [(job_id, i) for i in range(len(items))],
+            )
+
+        cancel_event = threading.Event()
+        self._cancel_events[job_id] = cancel_event
+        remaining = [len(packs)]
+        remaining_lock = threading.Lock()
+
+        def run_pack(indices):
+            try:
+                if cancel_event.is_set():
+                    for index in indices:
+                        self._finish_item(job_id, index, 'cancelled')
+                    return
+                self._write("UPDATE jobs SET status = 'running', updated_at = ? WHERE id = ? AND status = 'queued'", (time.time(), job_id))
+                try:
+                    if len(indices) == 1:
+                        outcomes = [worker(items[indices[0]], params)]
+                    else:
+                        outcomes = pack_worker([items[index] for index in indices], params)
+                except Exception as e:
+                    outcomes = [e] * len(indices)
+                for index, outcome in zip(indices, outcomes):
+                    if isinstance(outcome, Exception):
+                        self._finish_item(job_id, index, 'failed', error=str(outcome))
+                        continue
+                    try:
+                        result, meta = outcome
+                        path = self._store_result(job_id, index, result)
+                        self._finish_item(job_id, index, 'done', path, meta=meta)
+                    except Exception as e:
+                        self._finish_item(job_id, index, 'failed', error=str(e))
+            finally:
+                with remaining_lock:
+                    remaining[0] -= 1
+                    last = remaining[0] == 0
+                if last:
+                    self._finish_job(job_id)
+
+        if not packs:
+            self._finish_job(job_id)
+        for indices in packs:
+            self._executor.submit(run_pack, indices)
+        return job_id
+
+    def _store_result(self, job_id, index, result):
+        job_dir = os.path.join(self.results_dir, job_id)
+        os.makedirs(job_dir, exist_ok=True)
+        if isinstance(result, ImageResult):
+            path, data = os.path.join(job_dir, f"{index}.{result.extension}"), result.data
+        else:
+            path, data = os.path.join(job_dir, f"{index}.txt"), str(result).encode('utf-8')
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        return path
+
+    def _finish_item(self, job_id, index, status, path=None, error=None, meta=None):
+        counter = {'done': 'completed', 'failed': 'failed'}.get(status)
+        now = time.time()
+        with self._db_lock, self._connect() as db:
+            db.execute(
+                "UPDATE job_items SET status = ?, result_path = ?, error = ?, meta = ?, finished_at = ? WHERE job_id = ? AND item_index = ?",
+                (status, path, error, json.dumps(meta, default=str) if meta else None, now, job_id, index),
+            )
+            if counter:
+                db.execute(f"UPDATE jobs SET {counter} = {counter} + 1, updated_at = ? WHERE id = ?", (now, job_id))
+
+    def _finish_job(self, job_id):
+        cancel_event = self._cancel_events.pop(job_id, None)
+        status = 'cancelled' if cancel_event is not None and cancel_event.is_set() else 'finished'
+        self._write("UPDATE jobs SET status = ?, updated_at = ? WHERE id = ?", (status, time.time(), job_id))
+
+    def cancel(self, job_id, owner=None):
+        """Stop starting new items of an owner's job; items already running finish normally"""
+        if self.get_job(job_id, owner) is None:
+            return False
+        cancel_event = self._cancel_events.get(job_id)
+        if cancel_event is None:
+            return False
+        cancel_event.set()
+        return True
+
+    def get_job(self, job_id, owner=None):
+        """Owner's job row as a dict, or None"""
+        with self._connect() as db:
+            row = db.execute("SELECT * FROM jobs WHERE id = ? AND owner IS ?", (job_id, owner)).fetchone()
+        return _job_dict(row) if row else None
+
+    def list_jobs(self, kind=None, owner=None, limit=20):
+        """Owner's most recent jobs first"""
+        sql, params = "SELECT * FROM jobs WHERE owner IS ?", (owner,)
+        if kind:
+            sql, params = sql + " AND kind = ?", (*params, kind)
+        with self._connect() as db:
+            rows = db.execute(sql + " ORDER BY created_at DESC LIMIT ?", (*params, limit)).fetchall()
+        return [_job_dict(row) for row in rows]
+
+    def prune(self):
+        """Delete finished jobs past the retention age or beyond the newest max_kept, with their results"""
+        conditions, params = [], []
+        if self.retention is not None:
+            conditions.append("created_at < ?")
+            params.append(time.time() - self.retention)
+        if self.max_kept is not None:
+            conditions.append("id NOT IN (SELECT id FROM jobs ORDER BY created_at DESC LIMIT ?)")
+            params.append(self.max_kept)
+        if not conditions:
+            return 0
+        placeholders = ", ".join("?" * len(ACTIVE_STATUSES))
+        sql = f"SELECT id FROM jobs WHERE status NOT IN ({placeholders}) AND ({' OR '.join(conditions)})"
+        with self._db_lock, self._connect() as db:
+            expired = [row['id'] for row in db.execute(sql, (*ACTIVE_STATUSES, *params))]
+            db.executemany("DELETE FROM job_items WHERE job_id = ?", [(job_id,) for job_id in expired])
+            db.executemany("DELETE FROM jobs WHERE id = ?", [(job_id,) for job_id in expired])
+        for job_id in expired:
+            shutil.rmtree(os.path.join(self.results_dir, job_id), ignore_errors=True)
+        return len(expired)
+
+    def get_items(self, job_id, statuses=None, limit=None, latest_first=False, offset=0):
+        """Finished item rows of a job, in item order or most recently finished first"""
+        statuses = statuses or ('done', 'failed')
+        placeholders = ", ".join("?" * len(statuses))
+        order = "finished_at DESC" if latest_first else "item_index"
+        sql = f"SELECT * FROM job_items WHERE job_id = ? AND status IN ({placeholders}) ORDER BY {order}"
+        params = (job_id, *statuses)
+        if limit:
+            sql, params = sql + " LIMIT ? OFFSET ?", (*params, limit, offset)
+        with self._connect() as db:
+            rows = db.execute(sql, params).fetchall()
+        items = []
+        for row in rows:
+            item = dict(row)
+            item['meta'] = json.loads(item['meta']) if item['meta'] else {}
+            items.append(item)
+        return items
+
+def _job_dict(row):
+    job = dict(row)
+    job['params'] = json.loads(job['params']) if job['params'] else {}
+    return job
+
+def load_result(item):
+    """Read a finished item's result back from disk: ImageResult for images, str for text"""
+    path = item.get('result_path')
+    if not path or not os.path.exists(path):
+        return None
+    with open(path, 'rb') as f:
+        data = f.read()
+    if path.endswith('.txt'):
+        return data.decode('utf-8')
+    return ImageResult(data)
+
+# One manager (and worker pool) per process, shared by every session
+job_manager = JobManager(JOB_DIR, JOB_MAX_WORKERS, retention=JOB_RETENTION_SECONDS, max_kept=JOB_MAX_KEPT)
@@ -0,0 +1,109 @@
+import threading
+import time
+from google.genai import types
+
+def estimate_tokens(text):
+    """Rough token count of English text (about four characters per token)"""
+    return len(text) // 4
+
+class PromptPrefixCache:
+    """Registers static prompt prefixes with the provider's context cache.
+
+    get_handle() returns the name of a cached-content entry holding the
+    prefix, or None when the caller should send the prefix inline. It never
+    blocks on the provider: an unregistered prefix is sent inline while it is
+    registered in the background through ``create(client, **kwargs)`` (the
+    caller's rate limited, retried call), and handles are renewed the same
+    way shortly before they expire.
+
+    Prefixes shorter than ``min_tokens`` (the provider's minimum cacheable
+    size) are always sent inline. A failed registration only pauses that
+    prefix for ``retry_after`` seconds.
+    """
+
+    def __init__(self, create, ttl, retry_after, min_tokens, enabled=True, refresh_margin=60):
+        self.create = create
+        self.ttl = ttl
+        self.retry_after = retry_after
+        self.min_tokens = min_tokens
+        self.enabled = enabled
+        self.refresh_margin = refresh_margin
+        self._handles = {}
+        self._unavailable_until = {}
+        self._registering = set()
+        self._lock = threading.Lock()
+        self._stats = {'cached_calls': 0, 'inline_calls': 0, 'created': 0, 'errors': 0, 'too_short': 0}
+
+    def get_handle(self, client, model, key, prefix):
+        """Cached-content name for prefix, or None to send it inline"""
+        if not self.enabled or not hasattr(client, 'caches'):
+            with self._lock:
+                self._stats['inline_calls'] += 1
+            return None
+        if estimate_tokens(prefix) < self.min_tokens:
+            with self._lock:
+                self._stats['too_short'] += 1
+                self._stats['inline_calls'] += 1
+            return None
+
+        now = time.monotonic()
+        with self._lock:
+            handle = self._handles.get(key)
+            if handle is not None and handle[1] <= now:
+                # Expired on the provider side; send inline until it is registered again
+                del self._handles[key]
+                handle = None
+            register = (
+                (handle is None or handle[1] - self.refresh_margin <= now)
+                and key not in self._registering
+                and now >= self._unavailable_until.get(key, 0.0)
+            )
+            if register:
+                self._registering.add(key)
+            self._stats['cached_calls' if handle else 'inline_calls'] += 1
+
+        if register:
+            threading.Thread(
+                target=self._register,
+                args=(client, model, key, prefix),
+                name="prompt-cache",
+                daemon=True,
+            ).start()
+        return handle[0] if handle else None
+
+    def _register(self, client, model, key, prefix):
+        try:
+            cached = self.create(
+                client,
+                model=model,
+                config=types.CreateCachedContentConfig(
+                    contents=[types.Content(role='user', parts=[types.Part(text=prefix)])],
+                    ttl=f"{self.ttl}s",
+                    display_name=f"prompt-{key[0]}"[:128],
+                ),
+            )
+        except Exception as e:
+            with self._lock:
+                self._unavailable_until[key] = time.monotonic() + self.retry_after
+                self._stats['errors'] += 1
+            print(f"Context caching of the {key[0]} prompt failed, sending it inline: {e}")
+            return
+        finally:
+            with self._lock:
+                self._registering.discard(key)
+
+        with self._lock:
+            self._handles[key] = (cached.name, time.monotonic() + self.ttl)
+            self._unavailable_until.pop(key, None)
+            self._stats['created'] += 1
+
+    def invalidate(self, key):
+        """Forget a handle the provider rejected so it is registered again"""
+        with self._lock:
+            self._handles.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['handles'] = len(self._handles)
+        return stats
@@ -0,0 +1,134 @@
+import asyncio
+import threading
+import time
+from contextlib import contextmanager, asynccontextmanager
+
+# HTTP status codes that mean the provider wants us to slow down
+OVERLOAD_STATUS_CODES = {429, 503}
+
+def is_overload_error(error):
+    """Whether an API error is a quota / overload response"""
+    code = getattr(error, 'code', None) or getattr(error, 'status_code', None)
+    if code is None:
+        response = getattr(error, 'response', None)
+        code = getattr(response, 'status_code', None)
+    return code in OVERLOAD_STATUS_CODES
+
+class AdaptiveRateLimiter:
+    """Process-wide admission control for model calls.
+
+    Combines a token bucket (requests per minute with a burst allowance) with a
+    cap on concurrent requests. The concurrency cap adapts AIMD-style: it grows
+    by roughly one slot per window of successful calls and halves whenever the
+    provider answers with 429/503.
+    """
+
+    def __init__(self, requests_per_minute, burst, max_concurrency, min_concurrency=1):
+        self.rate = requests_per_minute / 60.0
+        self.capacity = float(burst)
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self._tokens = float(burst)
+        self._last_refill = time.monotonic()
+        self._limit = float(max_concurrency)
+        self._in_flight = 0
+        self._condition = threading.Condition()
+        self._stats = {'admitted': 0, 'throttled': 0, 'overloads': 0, 'wait_seconds': 0.0}
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._last_refill) * self.rate)
+        self._last_refill = now
+
+    def acquire(self):
+        """Block until a concurrency slot and a rate token are both available"""
+        started = time.monotonic()
+        with self._condition:
+            waited = False
+            while True:
+                self._refill()
+                if self._in_flight < int(self._limit) and self._tokens >= 1:
+                    break
+                waited = True
+                if self._in_flight >= int(self._limit):
+                    self._condition.wait()
+                else:
+                    self._condition.wait((1 - self._tokens) / self.rate)
+            self._tokens -= 1
+            self._in_flight += 1
+            self._stats['admitted'] += 1
+            if waited:
+                self._stats['throttled'] += 1
+                self._stats['wait_seconds'] += time.monotonic() - started
+
+    def try_acquire(self):
+        """Take a slot without blocking; return 0 when admitted, otherwise seconds to wait before retrying"""
+        with self._condition:
+            self._refill()
+            if self._in_flight >= int(self._limit):
+                # No way to be woken from an event loop, so poll at a short interval
+                return 0.05
+            if self._tokens < 1:
+                return (1 - self._tokens) / self.rate
+            self._tokens -= 1
+            self._in_flight += 1
+            self._stats['admitted'] += 1
+            return 0
+
+    async def acquire_async(self):
+        """Wait without blocking the event loop until a slot and a rate token are available"""
+        started = time.monotonic()
+        delay = self.try_acquire()
+        if not delay:
+            return
+        while delay:
+            await asyncio.sleep(delay)
+            delay = self.try_acquire()
+        with self._condition:
+            self._stats['throttled'] += 1
+            self._stats['wait_seconds'] += time.monotonic() - started
+
+    def release(self, overloaded=False):
+        """Free a slot and adapt the concurrency cap to the call's outcome"""
+        with self._condition:
+            self._in_flight -= 1
+            if overloaded:
+                self._stats['overloads'] += 1
+                self._limit = max(self.min_concurrency, self._limit / 2)
+            else:
+                self._limit = min(self.max_concurrency, self._limit + 1 / max(self._limit, 1))
+            self._condition.notify_all()
+
+    @contextmanager
+    def slot(self):
+        """Hold an admission slot for the duration of one API call"""
+        self.acquire()
+        overloaded = False
+        try:
+            yield
+        except Exception as e:
+            overloaded = is_overload_error(e)
+            raise
+        finally:
+            self.release(overloaded)
+
+    @asynccontextmanager
+    async def slot_async(self):
+        """Async counterpart of slot()"""
+        await self.acquire_async()
+        overloaded = False
+        try:
+            yield
+        except Exception as e:
+            overloaded = is_overload_error(e)
+            raise
+        finally:
+            self.release(overloaded)
+
+    def stats(self):
+        """Return admission counters and the current concurrency cap"""
+        with self._condition:
+            stats = dict(self._stats)
+            stats['concurrency_limit'] = int(self._limit)
+            stats['in_flight'] = self._in_flight
+        return stats
@@ -0,0 +1,96 @@
+import asyncio
+import random
+import threading
+import time
+import httpx
+
+# Status codes worth another attempt; everything else in the 4xx range is permanent
+TRANSIENT_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+def is_transient_error(error):
+    """Whether a failed call may succeed if simply tried again"""
+    if isinstance(error, (httpx.TransportError, ConnectionError, TimeoutError)):
+        return True
+    code = getattr(error, 'code', None) or getattr(error, 'status_code', None)
+    if code is None:
+        response = getattr(error, 'response', None)
+        code = getattr(response, 'status_code', None)
+    return code in TRANSIENT_STATUS_CODES
+
+class RetryPolicy:
+    """Capped exponential backoff with full jitter, bounded by a per-call deadline"""
+
+    def __init__(self, max_attempts=4, base_delay=1.0, max_delay=20.0, deadline=120.0):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+
+    def backoff(self, attempt):
+        """Delay before retry number ``attempt`` (1-based)"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+_stats_lock = threading.Lock()
+_retry_stats = {}
+
+def _record(operation, key, amount=1):
+    with _stats_lock:
+        stats = _retry_stats.setdefault(operation, {'calls': 0, 'retries': 0, 'recovered': 0, 'failed': 0})
+        stats[key] += amount
+
+def retry_stats():
+    """Per-operation counters: calls, retries, calls recovered by a retry, and failures"""
+    with _stats_lock:
+        return {operation: dict(stats) for operation, stats in _retry_stats.items()}
+
+def call_with_retry(fn, operation, policy):
+    """Call fn(deadline), retrying transient errors until it succeeds, the attempts run out or the deadline passes.
+
+    deadline is the time.monotonic() value the whole call must finish by;
+    fn is expected to bound its own attempt by it (see client.with_deadline).
+    """
+    deadline = time.monotonic() + policy.deadline
+    _record(operation, 'calls')
+    attempt = 1
+    while True:
+        try:
+            result = fn(deadline)
+            if attempt > 1:
+                _record(operation, 'recovered')
+            return result
+        except Exception as e:
+            if not is_transient_error(e) or attempt >= policy.max_attempts:
+                _record(operation, 'failed')
+                raise
+            delay = policy.backoff(attempt)
+            if time.monotonic() + delay >= deadline:
+                _record(operation, 'failed')
+                raise
+            _record(operation, 'retries')
+            print(f"Retrying {operation} after transient error ({attempt}/{policy.max_attempts}): {e}")
+            time.sleep(delay)
+            attempt += 1
+
+async def call_with_retry_async(fn, operation, policy):
+    """Async counterpart of call_with_retry; fn is a coroutine function taking the deadline"""
+    deadline = time.monotonic() + policy.deadline
+    _record(operation, 'calls')
+    attempt = 1
+    while True:
+        try:
+            result = await fn(deadline)
+            if attempt > 1:
+                _record(operation, 'recovered')
+            return result
+        except Exception as e:
+            if not is_transient_error(e) or attempt >= policy.max_attempts:
+                _record(operation, 'failed')
+                raise
+            delay = policy.backoff(attempt)
+            if time.monotonic() + delay >= deadline:
+                _record(operation, 'failed')
+                raise
+            _record(operation, 'retries')
+            print(f"Retrying {operation} after transient error ({attempt}/{policy.max_attempts}): {e}")
+            await asyncio.sleep(delay)
+            attempt += 1
@@ -0,0 +1,49 @@
+import threading
+from concurrent.futures import Future
+
+class SingleFlight:
+    """Coalesces concurrent identical calls into one.
+
+    The first caller for a key runs the function; callers that arrive with the
+    same key while it is in flight wait for and share its result (or error).
+    Nothing is remembered once the call completes.
+    """
+
+    def __init__(self):
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self._stats = {'calls': 0, 'shared': 0}
+
+    def do(self, key, fn):
+        """Return fn()'s result, sharing one execution among concurrent callers of key"""
+        with self._lock:
+            self._stats['calls'] += 1
+            future = self._in_flight.get(key)
+            if future is not None:
+                self._stats['shared'] += 1
+                leader = False
+            else:
+                future = Future()
+                self._in_flight[key] = future
+                leader = True
+
+        if not leader:
+            return future.result()
+
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['in_flight'] = len(self._in_flight)
+        return stats
@@ -0,0 +1,169 @@
+import time
+import types as pytypes
+import PIL.Image
+import pytest
+from services import analysis_service, async_api, client as client_module
+from services.analysis_service import (
+    analyze_image_content,
+    analyze_image_content_stream,
+    get_analysis_prompt,
+    prompt_cache_key,
+)
+from services.async_api import analyze_image_content_async, run_sync
+from services.client import create_cached_content, set_client
+from services.prompt_cache import PromptPrefixCache
+from services.rate_limiter import AdaptiveRateLimiter
+
+class Rejected(Exception):
+    """Permanent API error, as raised for an expired or unknown cached content name"""
+    code = 404
+
+class StandInClient:
+    """Records every request and answers with fixed text; caches.create only exists when caching is on"""
+
+    def __init__(self, caching=True, reject_handles=False, failing_prompts=()):
+        self.requests = []
+        self.registered = []
+        self.reject_handles = reject_handles
+        self.failing_prompts = failing_prompts
+        self.models = pytypes.SimpleNamespace(
+            generate_content=self.generate_content,
+            generate_content_stream=self.generate_content_stream,
+        )
+        self.aio = pytypes.SimpleNamespace(models=pytypes.SimpleNamespace(generate_content=self.generate_content_async))
+        if caching:
+            self.caches = pytypes.SimpleNamespace(create=self.create_cache)
+
+    def create_cache(self, model, config):
+        prefix = config.contents[0].parts[0].text
+        if prefix in self.failing_prompts:
+            raise ValueError("400 cached content is too small")
+        self.registered.append(prefix)
+        return pytypes.SimpleNamespace(name=f"cachedContents/{len(self.registered)}")
+
+    def respond(self, contents, config):
+        self.requests.append((contents, config))
+        if self.reject_handles and config is not None and config.cached_content:
+            raise Rejected("404 cached content not found")
+        return pytypes.SimpleNamespace(parts=[pytypes.SimpleNamespace(text="analysis")], parsed=None)
+
+    def generate_content(self, model, contents, config=None):
+        return self.respond(contents, config)
+
+    def generate_content_stream(self, model, contents, config=None):
+        return iter([self.respond(contents, config)])
+
+    async def generate_content_async(self, model, contents, config=None):
+        return self.respond(contents, config)
+
+@pytest.fixture
+def image():
+    return PIL.Image.new('RGB', (32, 32), 'red')
+
+@pytest.fixture
+def use_client(monkeypatch):
+    """Install a stand-in client and a fresh prompt cache that accepts the built-in prompts"""
+    # The process-wide limiter would pace these calls like real quota-bound requests
+    monkeypatch.setattr(client_module, 'rate_limiter', AdaptiveRateLimiter(
+        requests_per_minute=60000, burst=1000, max_concurrency=8, min_concurrency=1,
+    ))
+    cache = PromptPrefixCache(create=create_cached_content, ttl=3600, retry_after=600, min_tokens=0)
+    monkeypatch.setattr(analysis_service, 'prompt_cache', cache)
+    monkeypatch.setattr(async_api, 'prompt_cache', cache)
+
+    def install(stand_in):
+        set_client(stand_in)
+        return stand_in, cache
+
+    yield install
+    set_client(None)
+
+def cached_handle(config):
+    """Cached content name a request referenced, if any"""
+    return config.cached_content if config is not None else None
+
+def wait_for_registration(cache, created=1):
+    deadline = time.monotonic() + 5
+    while cache.stats()['created'] + cache.stats()['errors'] < created:
+        assert time.monotonic() < deadline, "prompt registration did not finish"
+        time.sleep(0.01)
+
+def test_handle_path_sends_only_the_image(use_client, image):
+    stand_in, cache = use_client(StandInClient())
+
+    # The first call goes inline while the prompt is registered in the background
+    assert analyze_image_content(image, "complete", use_cache=False) == "analysis"
+    contents, config = stand_in.requests[-1]
+    assert contents[0] == get_analysis_prompt("complete") and not cached_handle(config)
+    wait_for_registration(cache)
+
+    assert analyze_image_content(image, "complete", use_cache=False) == "analysis"
+    contents, config = stand_in.requests[-1]
+    assert len(contents) == 1
+    assert cached_handle(config) == "cachedContents/1"
+
+    assert run_sync(analyze_image_content_async(image, "complete", use_cache=False)) == "analysis"
+    assert cached_handle(stand_in.requests[-1][1]) == "cachedContents/1"
+
+    assert "".join(analyze_image_content_stream(image, "complete", use_cache=False)) == "analysis"
+    assert cached_handle(stand_in.requests[-1][1]) == "cachedContents/1"
+    assert stand_in.registered == [get_analysis_prompt("complete")]
+
+def test_structured_handle_keeps_json_mode(use_client, image):
+    stand_in, cache = use_client(StandInClient())
+    analyze_image_content(image, "technical_quality", use_cache=False, structured=True)
+    wait_for_registration(cache)
+    analyze_image_content(image, "technical_quality", use_cache=False, structured=True)
+    config = stand_in.requests[-1][1]
+    assert cached_handle(config) == "cachedContents/1"
+    assert config.response_mime_type == "application/json"
+
+def test_inline_without_context_caching(use_client, image):
+    stand_in, cache = use_client(StandInClient(caching=False))
+    for _ in range(2):
+        assert analyze_image_content(image, "complete", use_cache=False) == "analysis"
+        contents, config = stand_in.requests[-1]
+        assert contents[0] == get_analysis_prompt("complete") and not cached_handle(config)
+    assert cache.stats()['inline_calls'] == 2
+
+def test_short_prompts_are_not_registered(use_client, image):
+    stand_in, cache = use_client(StandInClient())
+    cache.min_tokens = 100000
+    analyze_image_content(image, "complete", use_cache=False)
+    assert stand_in.registered == []
+    assert cache.stats()['too_short'] == 1
+
+def test_rejected_handle_is_resent_inline(use_client, image):
+    stand_in, cache = use_client(StandInClient())
+    analyze_image_content(image, "complete", use_cache=False)
+    wait_for_registration(cache)
+    stand_in.reject_handles = True
+
+    assert analyze_image_content(image, "complete", use_cache=False) == "analysis"
+    (_, rejected), (contents, config) = stand_in.requests[-2:]
+    assert cached_handle(rejected) == "cachedContents/1"
+    assert contents[0] == get_analysis_prompt("complete") and not cached_handle(config)
+    assert cache.stats()['handles'] == 0
+
+def test_rejected_handle_restarts_stream_inline(use_client, image):
+    stand_in, cache = use_client(StandInClient())
+    analyze_image_content(image, "complete", use_cache=False)
+    wait_for_registration(cache)
+    stand_in.reject_handles = True
+
+    assert "".join(analyze_image_content_stream(image, "complete", use_cache=False)) == "analysis"
+    assert stand_in.requests[-1][0][0] == get_analysis_prompt("complete")
+
+def test_failed_registration_only_pauses_that_prompt(use_client, image):
+    stand_in, cache = use_client(StandInClient(failing_prompts=(get_analysis_prompt("complete"),)))
+    analyze_image_content(image, "complete", use_cache=False)
+    analyze_image_content(image, "text_extraction", use_cache=False)
+    wait_for_registration(cache, created=2)
+    assert cache.stats()['errors'] == 1
+
+    analyze_image_content(image, "complete", use_cache=False)
+    analyze_image_content(image, "text_extraction", use_cache=False)
+    wait_for_registration(cache, created=2)
+    assert len(stand_in.requests[-1][0]) == 1
+    assert stand_in.requests[-2][0][0] == get_analysis_prompt("complete")
+    assert cache._unavailable_until.keys() == {prompt_cache_key("complete")}
@@ -0,0 +1,76 @@
+import time
+import types as pytypes
+import pytest
+from services import client as client_module
+from services.client import generate_content, set_client
+from services.rate_limiter import AdaptiveRateLimiter
+from services.retry import RetryPolicy
+
+class QuotaExceeded(Exception):
+    """API error with the status code of a 429 response"""
+    code = 429
+
+class StandInServer:
+    """Stand-in client that answers 429 for the next ``overloaded`` calls, then succeeds"""
+
+    def __init__(self, overloaded=0):
+        self.overloaded = overloaded
+        self.calls = 0
+        self.models = pytypes.SimpleNamespace(generate_content=self.generate_content)
+
+    def generate_content(self, model, contents, config=None):
+        self.calls += 1
+        if self.overloaded:
+            self.overloaded -= 1
+            raise QuotaExceeded("429 resource exhausted")
+        return pytypes.SimpleNamespace(text="ok")
+
+@pytest.fixture
+def limiter(monkeypatch):
+    """Fresh limiter without rate pacing, and retries with negligible backoff"""
+    limiter = AdaptiveRateLimiter(requests_per_minute=60000, burst=1000, max_concurrency=8)
+    monkeypatch.setattr(client_module, 'rate_limiter', limiter)
+    monkeypatch.setattr(client_module, 'get_retry_policy', lambda operation: RetryPolicy(
+        max_attempts=4, base_delay=0.001, max_delay=0.001, deadline=10,
+    ))
+    yield limiter
+    set_client(None)
+
+def test_concurrency_halves_on_429_and_recovers(limiter):
+    server = StandInServer(overloaded=2)
+    set_client(server)
+
+    assert generate_content(model="m", contents="x").text == "ok"
+    assert server.calls == 3
+    # Two 429s halve the cap twice; the successful retry adds a fraction of a slot back
+    assert limiter.stats()['concurrency_limit'] == 2
+    assert limiter.stats()['overloads'] == 2
+
+    for _ in range(30):
+        generate_content(model="m", contents="x")
+    assert limiter.stats()['concurrency_limit'] == 8
+    assert limiter.stats()['in_flight'] == 0
+
+def test_concurrency_never_drops_below_minimum(limiter):
+    set_client(StandInServer(overloaded=100))
+    with pytest.raises(QuotaExceeded):
+        generate_content(model="m", contents="x")
+    assert limiter.stats()['concurrency_limit'] == limiter.min_concurrency
+
+def test_slot_is_released_on_errors(limiter):
+    with pytest.raises(ValueError):
+        with limiter.slot():
+            raise ValueError("permanent failure")
+    assert limiter.stats()['in_flight'] == 0
+    # Non-quota errors count as a normal outcome, not an overload
+    assert limiter.stats()['overloads'] == 0
+
+def test_token_bucket_paces_after_burst():
+    limiter = AdaptiveRateLimiter(requests_per_minute=600, burst=2, max_concurrency=8)
+    started = time.monotonic()
+    for _ in range(4):
+        with limiter.slot():
+            pass
+    # Two calls use the burst; the other two wait for tokens at 10 per second
+    assert time.monotonic() - started >= 0.18
+    assert limiter.stats()['throttled'] >= 1
@@ -0,0 +1,65 @@
+import time
+import httpx
+import pytest
+from google.genai import types
+from services.client import with_deadline
+from services.retry import RetryPolicy, call_with_retry, is_transient_error
+
+class ApiError(Exception):
+    def __init__(self, code):
+        super().__init__(f"{code} error")
+        self.code = code
+
+def fast_policy(max_attempts=4, deadline=10):
+    return RetryPolicy(max_attempts=max_attempts, base_delay=0.001, max_delay=0.001, deadline=deadline)
+
+def failing(errors, result="ok"):
+    """fn(deadline) raising the given errors in turn, then returning result"""
+    errors = list(errors)
+    calls = []
+
+    def fn(deadline):
+        calls.append(deadline)
+        if errors:
+            raise errors.pop(0)
+        return result
+
+    return fn, calls
+
+@pytest.mark.parametrize("error", [ApiError(429), ApiError(503), ApiError(500), httpx.ConnectError("refused"), TimeoutError()])
+def test_transient_errors_are_retried(error):
+    assert is_transient_error(error)
+    fn, calls = failing([error])
+    assert call_with_retry(fn, "test_transient", fast_policy()) == "ok"
+    assert len(calls) == 2
+
+@pytest.mark.parametrize("error", [ApiError(400), ApiError(403), ApiError(404), ValueError("bad response")])
+def test_permanent_errors_are_not_retried(error):
+    assert not is_transient_error(error)
+    fn, calls = failing([error])
+    with pytest.raises(type(error)):
+        call_with_retry(fn, "test_permanent", fast_policy())
+    assert len(calls) == 1
+
+def test_attempts_are_capped():
+    fn, calls = failing([ApiError(503)] * 10)
+    with pytest.raises(ApiError):
+        call_with_retry(fn, "test_attempts", fast_policy(max_attempts=3))
+    assert len(calls) == 3
+
+def test_every_attempt_shares_one_deadline():
+    fn, calls = failing([ApiError(503)] * 2)
+    started = time.monotonic()
+    call_with_retry(fn, "test_deadline", fast_policy(deadline=5))
+    assert len(set(calls)) == 1
+    assert started + 5 <= calls[0] <= time.monotonic() + 5
+
+def test_request_timeout_is_capped_by_the_deadline():
+    kwargs = with_deadline({'model': "m", 'config': types.GenerateContentConfig(temperature=0.5)}, time.monotonic() + 2)
+    assert 0 < kwargs['config'].http_options.timeout <= 2000
+    # Other settings are kept
+    assert kwargs['config'].temperature == 0.5
+
+def test_spent_deadline_stops_before_the_request():
+    with pytest.raises(TimeoutError):
+        with_deadline({'model': "m"}, time.monotonic() - 1)
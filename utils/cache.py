@@ -0,0 +1,223 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+def make_cache_key(*parts):
+    """Build a stable cache key from JSON-serializable parts"""
+    payload = json.dumps(parts, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def image_digest(image):
+    """Stable digest of an image's decoded pixel data"""
+    # Encoded results (utils.image_result.ImageResult) hash their decoded pixels too
+    image = getattr(image, 'image', image)
+    digest = hashlib.sha256()
+    digest.update(f"{image.mode}:{image.size[0]}x{image.size[1]}:".encode('utf-8'))
+    digest.update(image.tobytes())
+    return digest.hexdigest()
+
+class ResultCache:
+    """Thread-safe LRU cache of encoded results with an optional disk tier.
+
+    Values are bytes. The memory tier is bounded by entry count and total
+    bytes; the disk tier is write-through and bounded by total bytes, evicting
+    the least recently used files (hits touch a file's atime, so the order
+    survives restarts). Entries older than ``ttl`` seconds are treated as
+    misses in both tiers. Disk reads and writes happen outside the lock.
+    """
+
+    def __init__(self, name, max_entries=128, max_bytes=None, ttl=None,
+                 disk_dir=None, max_disk_bytes=None):
+        self.name = name
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.disk_dir = os.path.join(disk_dir, name) if disk_dir else None
+        self.max_disk_bytes = max_disk_bytes
+        self._entries = OrderedDict()
+        self._memory_bytes = 0
+        # key -> size of each file in the disk tier, least recently used first
+        self._disk_entries = OrderedDict()
+        self._disk_bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {
+            'hits': 0,
+            'disk_hits': 0,
+            'misses': 0,
+            'evictions': 0,
+            'disk_evictions': 0,
+            'bytes_saved': 0,
+        }
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+            self._load_disk_index()
+
+    def _load_disk_index(self):
+        """Scan the disk tier once at startup; afterwards its size is tracked incrementally"""
+        files = []
+        for entry in os.scandir(self.disk_dir):
+            if entry.name.endswith('.bin'):
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                files.append((max(stat.st_atime, stat.st_mtime), entry.name[:-len('.bin')], stat.st_size))
+        for _, key, size in sorted(files):
+            self._disk_entries[key] = size
+            self._disk_bytes += size
+
+    def _expired(self, stored_at):
+        return self.ttl is not None and time.time() - stored_at > self.ttl
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, f"{key}.bin")
+
+    def _store_memory(self, key, value, stored_at):
+        if key in self._entries:
+            self._memory_bytes -= len(self._entries.pop(key)[0])
+        self._entries[key] = (value, stored_at)
+        self._memory_bytes += len(value)
+
+        while self._entries and (
+            len(self._entries) > self.max_entries
+            or (self.max_bytes is not None and self._memory_bytes > self.max_bytes)
+        ):
+            _, (evicted, _) = self._entries.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+            self._stats['evictions'] += 1
+
+    def _forget_disk(self, key):
+        """Drop key from the disk index (caller holds the lock)"""
+        size = self._disk_entries.pop(key, None)
+        if size is not None:
+            self._disk_bytes -= size
+
+    def _read_disk(self, key):
+        path = self._disk_path(key)
+        try:
+            stored_at = os.path.getmtime(path)
+            if self._expired(stored_at):
+                os.remove(path)
+                return None, None
+            with open(path, 'rb') as f:
+                value = f.read()
+            # Record the use in atime; mtime stays the write time the TTL is measured from
+            os.utime(path, (time.time(), stored_at))
+            return value, stored_at
+        except OSError:
+            return None, None
+
+    def _write_disk(self, key, value):
+        path = self._disk_path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(value)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Error writing {self.name} cache entry: {e}")
+            return False
+        return True
+
+    def _disk_victims(self):
+        """Pop least recently used disk entries until the tier fits its budget (caller holds the lock)"""
+        victims = []
+        if self.max_disk_bytes is None:
+            return victims
+        while self._disk_entries and self._disk_bytes > self.max_disk_bytes:
+            key, size = self._disk_entries.popitem(last=False)
+            self._disk_bytes -= size
+            self._stats['disk_evictions'] += 1
+            victims.append(key)
+        return victims
+
+    def _remove_files(self, keys):
+        for key in keys:
+            try:
+                os.remove(self._disk_path(key))
+            except OSError:
+                pass
+
+    def get(self, key):
+        """Return the cached bytes for key, or None on a miss"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, stored_at = entry
+                if not self._expired(stored_at):
+                    self._entries.move_to_end(key)
+                    self._stats['hits'] += 1
+                    self._stats['bytes_saved'] += len(value)
+                    return value
+                self._entries.pop(key)
+                self._memory_bytes -= len(value)
+            on_disk = self.disk_dir is not None and key in self._disk_entries
+            if not on_disk:
+                self._stats['misses'] += 1
+                return None
+
+        value, stored_at = self._read_disk(key)
+        with self._lock:
+            if value is None:
+                self._forget_disk(key)
+                self._stats['misses'] += 1
+                return None
+            if key in self._disk_entries:
+                self._disk_entries.move_to_end(key)
+            self._store_memory(key, value, stored_at)
+            self._stats['hits'] += 1
+            self._stats['disk_hits'] += 1
+            self._stats['bytes_saved'] += len(value)
+            return value
+
+    def put(self, key, value):
+        """Store bytes under key in memory and, if configured, on disk"""
+        with self._lock:
+            self._store_memory(key, value, time.time())
+        if not self.disk_dir or not self._write_disk(key, value):
+            return
+        with self._lock:
+            self._forget_disk(key)
+            self._disk_entries[key] = len(value)
+            self._disk_bytes += len(value)
+            victims = self._disk_victims()
+        self._remove_files(victims)
+
+    def invalidate(self, key):
+        """Drop a single entry from every tier"""
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._memory_bytes -= len(entry[0])
+            self._forget_disk(key)
+        if self.disk_dir:
+            self._remove_files([key])
+
+    def clear(self):
+        """Drop every entry from every tier"""
+        with self._lock:
+            self._entries.clear()
+            self._memory_bytes = 0
+            self._disk_entries.clear()
+            self._disk_bytes = 0
+        if self.disk_dir:
+            for entry in os.scandir(self.disk_dir):
+                if entry.name.endswith('.bin'):
+                    try:
+                        os.remove(entry.path)
+                    except OSError:
+                        pass
+
+    def stats(self):
+        """Return hit/miss counters and current memory and disk usage"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._entries)
+            stats['memory_bytes'] = self._memory_bytes
+            stats['disk_bytes'] = self._disk_bytes
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        return stats
@@ -0,0 +1,213 @@
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import datetime
+from config.config import HISTORY_DB_PATH
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS history (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    owner TEXT,
+    type TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    edit_type TEXT,
+    data TEXT NOT NULL,
+    thumbnails TEXT
+);
+"""
+
+# Every query is scoped to one owner, so each index leads with it
+INDEX_SCHEMA = """
+DROP INDEX IF EXISTS history_type_id;
+DROP INDEX IF EXISTS history_created_at;
+DROP INDEX IF EXISTS history_type_edit_type;
+CREATE INDEX IF NOT EXISTS history_owner_type_id ON history (owner, type, id);
+CREATE INDEX IF NOT EXISTS history_owner_created_at ON history (owner, created_at);
+CREATE INDEX IF NOT EXISTS history_owner_type_edit_type ON history (owner, type, edit_type);
+"""
+
+# Full-text index over each record's searchable text; rowid is the history id
+SEARCH_SCHEMA = """
+CREATE VIRTUAL TABLE history_fts USING fts5(body, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3');
+"""
+
+# Record fields worth searching, besides any extra text (e.g. OCR output) passed to add()
+SEARCH_FIELDS = ('prompt', 'edit_type', 'options', 'analysis_type')
+
+def field_text(value):
+    """Searchable text of a record field; for a dict (edit options) only its text values"""
+    if isinstance(value, dict):
+        return " ".join(item for item in value.values() if isinstance(item, str) and item)
+    return str(value)
+
+def search_body(data, search_text=None):
+    """Text indexed for a history record"""
+    parts = [field_text(data[field]) for field in SEARCH_FIELDS if data.get(field)]
+    if search_text:
+        parts.append(search_text)
+    return "\n".join(parts)
+
+def fts_query(text):
+    """Turn free text into an FTS5 query: every word must match, as a prefix"""
+    words = [word.replace('"', '') for word in text.split()]
+    return " ".join(f'"{word}"*' for word in words if word)
+
+class HistoryStore:
+    """Durable operation history in a local SQLite database.
+
+    Each record belongs to one owner (see utils.get_owner_id) and every read,
+    export and delete is limited to a single owner. Rows are only read a page
+    or an aggregate at a time: pages are keyed on the (monotonic) row id so
+    paging stays an index range scan however large the table grows.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self._write_lock = threading.Lock()
+        with self._connect() as db:
+            db.executescript(SCHEMA)
+            columns = {row['name'] for row in db.execute("PRAGMA table_info(history)")}
+            if 'thumbnails' not in columns:
+                db.execute("ALTER TABLE history ADD COLUMN thumbnails TEXT")
+            if 'owner' not in columns:
+                # Records from before history was scoped have no owner and are not shown to anyone
+                db.execute("ALTER TABLE history ADD COLUMN owner TEXT")
+            db.executescript(INDEX_SCHEMA)
+            if not db.execute("SELECT 1 FROM sqlite_master WHERE name = 'history_fts'").fetchone():
+                db.executescript(SEARCH_SCHEMA)
+                # Index records written before search existed
+                db.executemany(
+                    "INSERT INTO history_fts (rowid, body) VALUES (?, ?)",
+                    ((row['id'], search_body(json.loads(row['data']))) for row in db.execute("SELECT id, data FROM history")),
+                )
+
+    def _connect(self):
+        db = sqlite3.connect(self.db_path, timeout=30)
+        db.row_factory = sqlite3.Row
+        db.execute("PRAGMA journal_mode=WAL")
+        return db
+
+    def add(self, owner, item_type, data, thumbnails=None, search_text=None):
+        """Append and index one of owner's history records, returning its id.
+
+        thumbnails are (offset, length) pack references; search_text is extra
+        searchable text that is not part of data, such as extracted OCR text.
+        """
+        with self._write_lock, self._connect() as db:
+            cursor = db.execute(
+                "INSERT INTO history (owner, type, created_at, edit_type, data, thumbnails) VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    owner,
+                    item_type,
+                    time.time(),
+                    data.get('edit_type'),
+                    json.dumps(data, default=str),
+                    json.dumps(thumbnails) if thumbnails else None,
+                ),
+            )
+            db.execute(
+                "INSERT INTO history_fts (rowid, body) VALUES (?, ?)",
+                (cursor.lastrowid, search_body(data, search_text)),
+            )
+            return cursor.lastrowid
+
+    def page(self, owner, item_type, before_id=None, limit=20):
+        """Owner's newest records of a type with id below before_id"""
+        sql = "SELECT * FROM history WHERE owner = ? AND type = ?"
+        params = [owner, item_type]
+        if before_id is not None:
+            sql += " AND id < ?"
+            params.append(before_id)
+        with self._connect() as db:
+            rows = db.execute(sql + " ORDER BY id DESC LIMIT ?", (*params, limit)).fetchall()
+        return [_history_item(row) for row in rows]
+
+    def search(self, owner, text, item_type=None, edit_type=None, since=None, limit=50):
+        """Owner's best matches for free text, ranked by BM25, with a highlighted snippet per record"""
+        query = fts_query(text)
+        if not query:
+            return []
+        sql = (
+            "SELECT history.*, snippet(history_fts, 0, '**', '**', '...', 16) AS snippet "
+            "FROM history_fts JOIN history ON history.id = history_fts.rowid "
+            "WHERE history_fts MATCH ? AND history.owner = ?"
+        )
+        params = [query, owner]
+        for column, value in (('type', item_type), ('edit_type', edit_type)):
+            if value:
+                sql += f" AND history.{column} = ?"
+                params.append(value)
+        if since is not None:
+            sql += " AND history.created_at >= ?"
+            params.append(since)
+        with self._connect() as db:
+            rows = db.execute(sql + " ORDER BY rank LIMIT ?", (*params, limit)).fetchall()
+        items = []
+        for row in rows:
+            item = _history_item(row)
+            item['snippet'] = row['snippet']
+            items.append(item)
+        return items
+
+    def counts(self, owner, since=None):
+        """Number of owner's records per type, optionally only those created since a timestamp"""
+        sql, params = "SELECT type, COUNT(*) AS n FROM history", (owner,)
+        if since is not None:
+            # Without table statistics SQLite prefers scanning by type; a recent window is a small range
+            sql, params = sql + " INDEXED BY history_owner_created_at WHERE owner = ? AND created_at >= ?", (owner, since)
+        else:
+            sql += " WHERE owner = ?"
+        with self._connect() as db:
+            rows = db.execute(sql + " GROUP BY type", params).fetchall()
+        return {row['type']: row['n'] for row in rows}
+
+    def edit_type_counts(self, owner):
+        """(edit_type, count) pairs for owner's edits, most used first"""
+        with self._connect() as db:
+            rows = db.execute(
+                "SELECT COALESCE(edit_type, 'Unknown') AS edit_type, COUNT(*) AS n FROM history "
+                "WHERE owner = ? AND type = 'edit' GROUP BY edit_type ORDER BY n DESC",
+                (owner,),
+            ).fetchall()
+        return [(row['edit_type'], row['n']) for row in rows]
+
+    def export_json(self, owner):
+        """Write owner's records to a temporary JSON file, grouped by type, without loading them all"""
+        groups = [('generations', 'generation'), ('edits', 'edit'), ('analyses', 'analysis')]
+        export = tempfile.TemporaryFile()
+        with self._connect() as db:
+            export.write(b'{')
+            for n, (key, item_type) in enumerate(groups):
+                export.write(f'{"," if n else ""}"{key}":['.encode('utf-8'))
+                rows = db.execute("SELECT * FROM history WHERE owner = ? AND type = ? ORDER BY id DESC", (owner, item_type))
+                for i, row in enumerate(rows):
+                    prefix = b',' if i else b''
+                    export.write(prefix + json.dumps(_history_item(row)).encode('utf-8'))
+                export.write(b']')
+            export.write(b'}')
+        export.seek(0)
+        return export
+
+    def clear(self, owner):
+        """Delete all of owner's history"""
+        with self._write_lock, self._connect() as db:
+            db.execute("DELETE FROM history_fts WHERE rowid IN (SELECT id FROM history WHERE owner = ?)", (owner,))
+            db.execute("DELETE FROM history WHERE owner = ?", (owner,))
+
+def _history_item(row):
+    """Row as the {'id', 'owner', 'timestamp', 'type', 'data', 'thumbnails'} dict the UI works with"""
+    return {
+        'id': row['id'],
+        'owner': row['owner'],
+        'timestamp': datetime.fromtimestamp(row['created_at']).strftime("%Y-%m-%d %H:%M:%S"),
+        'type': row['type'],
+        'data': json.loads(row['data']),
+        'thumbnails': json.loads(row['thumbnails']) if row['thumbnails'] else [],
+    }
+
+# One store per process; SQLite handles concurrent readers across sessions
+history_store = HistoryStore(HISTORY_DB_PATH)
@@ -0,0 +1,76 @@
+import io
+import PIL.Image
+from google.genai import types
+
+# Magic-byte prefixes for the formats the API and our caches produce
+MIME_SIGNATURES = [
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'GIF8', 'image/gif'),
+]
+
+def sniff_mime_type(data):
+    """Guess an image MIME type from its leading bytes"""
+    for signature, mime_type in MIME_SIGNATURES:
+        if data.startswith(signature):
+            return mime_type
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return 'image/webp'
+    return 'image/png'
+
+class ImageResult:
+    """Encoded image bytes from the API, decoded to PIL only when needed.
+
+    Keeping the original payload means downloads, caches and st.image can use
+    the bytes as-is instead of re-encoding a decoded image.
+    """
+
+    def __init__(self, data, mime_type=None):
+        self.data = data
+        self.mime_type = mime_type or sniff_mime_type(data)
+        self._image = None
+
+    @classmethod
+    def from_part(cls, part):
+        """Build from a response part with inline image data, or return None"""
+        inline_data = getattr(part, 'inline_data', None)
+        if not inline_data or not inline_data.data:
+            return None
+        mime_type = inline_data.mime_type or sniff_mime_type(inline_data.data)
+        if not mime_type.startswith('image/'):
+            return None
+        return cls(inline_data.data, mime_type)
+
+    @classmethod
+    def from_pil(cls, image, format='PNG'):
+        """Encode a PIL image once and wrap the result"""
+        buf = io.BytesIO()
+        image.save(buf, format=format)
+        return cls(buf.getvalue(), f"image/{format.lower()}")
+
+    def to_part(self):
+        """Request part carrying the encoded bytes, so the SDK does not re-encode pixels"""
+        return types.Part.from_bytes(data=self.data, mime_type=self.mime_type)
+
+    @property
+    def format(self):
+        """PIL-style format name, e.g. 'PNG' or 'JPEG'"""
+        return self.mime_type.split('/', 1)[1].upper()
+
+    @property
+    def extension(self):
+        """File extension matching the encoded format"""
+        return 'jpg' if self.format == 'JPEG' else self.format.lower()
+
+    @property
+    def image(self):
+        """Decoded PIL image, created on first access"""
+        if self._image is None:
+            self._image = PIL.Image.open(io.BytesIO(self.data))
+        return self._image
+
+def to_content(image):
+    """Convert an image argument into request contents"""
+    if isinstance(image, ImageResult):
+        return image.to_part()
+    return image
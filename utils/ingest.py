@@ -0,0 +1,66 @@
+import io
+import PIL.Image
+import PIL.ImageOps
+from config.config import UPLOAD_MAX_EDGE, UPLOAD_JPEG_QUALITY
+from utils.image_result import ImageResult
+
+EXIF_ORIENTATION = 0x0112
+
+# Formats the API accepts as-is when no resize or rotation was needed
+PASSTHROUGH_FORMATS = {'JPEG': 'image/jpeg', 'PNG': 'image/png', 'WEBP': 'image/webp'}
+
+def has_alpha(image):
+    """Whether the image carries transparency that JPEG would drop"""
+    return image.mode in ('RGBA', 'LA', 'PA') or (image.mode == 'P' and 'transparency' in image.info)
+
+def normalize_upload(uploaded_file, operation="default"):
+    """Prepare an uploaded image before it is sent to the model.
+
+    Applies EXIF orientation, downscales to the maximum edge configured for
+    the operation and re-encodes compactly (JPEG, or PNG when there is
+    transparency). Returns an ImageResult and a dict of size statistics.
+    """
+    raw = uploaded_file.getvalue() if hasattr(uploaded_file, 'getvalue') else uploaded_file.read()
+    original = PIL.Image.open(io.BytesIO(raw))
+    original_format = original.format
+    original_size = original.size
+
+    rotated = original.getexif().get(EXIF_ORIENTATION, 1) != 1
+    image = PIL.ImageOps.exif_transpose(original) if rotated else original
+
+    max_edge = UPLOAD_MAX_EDGE.get(operation, UPLOAD_MAX_EDGE["default"])
+    resized = max(image.size) > max_edge
+    if resized:
+        image = image.copy()
+        image.thumbnail((max_edge, max_edge), PIL.Image.LANCZOS)
+
+    if not (rotated or resized) and original_format == 'JPEG':
+        # Already compact and correctly oriented; re-encoding would only lose quality
+        result = ImageResult(raw, 'image/jpeg')
+    elif has_alpha(image):
+        result = ImageResult.from_pil(image.convert('RGBA'), 'PNG')
+    else:
+        buf = io.BytesIO()
+        image.convert('RGB').save(buf, format='JPEG', quality=UPLOAD_JPEG_QUALITY, optimize=True)
+        result = ImageResult(buf.getvalue(), 'image/jpeg')
+
+    # Untouched uploads that are already smaller than our re-encode go through unchanged
+    if not (rotated or resized) and original_format in PASSTHROUGH_FORMATS and len(raw) < len(result.data):
+        result = ImageResult(raw, PASSTHROUGH_FORMATS[original_format])
+
+    stats = {
+        'operation': operation,
+        'bytes_before': len(raw),
+        'bytes_after': len(result.data),
+        'size_before': original_size,
+        'size_after': image.size,
+        'mime_type': result.mime_type,
+    }
+    return result, stats
+
+def format_ingest_stats(stats):
+    """Short caption describing how much an upload was shrunk"""
+    before_kb = stats['bytes_before'] / 1024
+    after_kb = stats['bytes_after'] / 1024
+    width, height = stats['size_after']
+    return f"Upload optimized: {before_kb:,.0f} KB → {after_kb:,.0f} KB ({width}×{height})"
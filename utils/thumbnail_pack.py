@@ -0,0 +1,113 @@
+import io
+import mmap
+import os
+import re
+import struct
+import threading
+from collections import OrderedDict
+from config.config import THUMBNAIL_DIR, THUMBNAIL_OPEN_PACKS, THUMBNAIL_MAX_EDGE, THUMBNAIL_JPEG_QUALITY
+
+# Each record is a 4-byte little-endian length followed by the encoded thumbnail,
+# so the pack can be walked (and its index rebuilt) without any other file
+RECORD_HEADER = struct.Struct('<I')
+
+# Appends from every pack object share one lock, so two objects for the same
+# file (one just dropped from the open-pack registry) never interleave writes
+_append_lock = threading.Lock()
+
+def make_thumbnail(image, max_edge=THUMBNAIL_MAX_EDGE, quality=THUMBNAIL_JPEG_QUALITY):
+    """Small JPEG preview of a PIL image or ImageResult"""
+    # Encoded results (utils.image_result.ImageResult) are decoded once here
+    image = getattr(image, 'image', image)
+    thumbnail = image.copy()
+    thumbnail.thumbnail((max_edge, max_edge))
+    if thumbnail.mode != 'RGB':
+        thumbnail = thumbnail.convert('RGB')
+    buf = io.BytesIO()
+    thumbnail.save(buf, format='JPEG', quality=quality, optimize=True)
+    return buf.getvalue()
+
+class ThumbnailPack:
+    """Append-only file of small encoded thumbnails, read through a memory map.
+
+    append() returns an (offset, length) reference that callers keep in their
+    own index (the history table); read() slices the bytes straight out of the
+    mapping, so nothing is decoded or held in memory between reruns.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        open(path, 'ab').close()
+        self._lock = threading.Lock()
+        self._file = None
+        self._map = None
+
+    def append(self, data):
+        """Append one thumbnail and return its (offset, length)"""
+        with _append_lock:
+            with open(self.path, 'ab') as f:
+                offset = f.tell() + RECORD_HEADER.size
+                f.write(RECORD_HEADER.pack(len(data)) + data)
+        return offset, len(data)
+
+    def _remap(self):
+        self._close()
+        if os.path.getsize(self.path) == 0:
+            return
+        self._file = open(self.path, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def read(self, offset, length):
+        """Bytes of the thumbnail at offset, or None if it is not in the pack"""
+        with self._lock:
+            if self._map is None or offset + length > len(self._map):
+                # The pack grew (or was cleared) since it was mapped
+                self._remap()
+            if self._map is None or offset + length > len(self._map):
+                return None
+            return self._map[offset:offset + length]
+
+    def add_images(self, images):
+        """Thumbnail and append each image, returning their references; failures are skipped"""
+        refs = []
+        for image in images:
+            try:
+                refs.append(self.append(make_thumbnail(image)))
+            except Exception as e:
+                print(f"Error creating thumbnail: {e}")
+        return refs
+
+    def clear(self):
+        """Drop every thumbnail"""
+        with self._lock:
+            self._close()
+            open(self.path, 'wb').close()
+
+# One pack file per history owner, so clearing a visitor's history deletes exactly their thumbnails
+_packs = OrderedDict()
+_packs_lock = threading.Lock()
+
+def get_thumbnail_pack(owner):
+    """The owner's thumbnail pack; the most recently used packs are kept open"""
+    if not re.fullmatch(r'[0-9A-Za-z_-]+', owner or ''):
+        raise ValueError(f"Invalid thumbnail pack owner: {owner!r}")
+    with _packs_lock:
+        pack = _packs.get(owner)
+        if pack is None:
+            pack = ThumbnailPack(os.path.join(THUMBNAIL_DIR, f"{owner}.pack"))
+            _packs[owner] = pack
+            while len(_packs) > THUMBNAIL_OPEN_PACKS:
+                # Dropped packs unmap once no reader still holds them
+                _packs.popitem(last=False)
+        else:
+            _packs.move_to_end(owner)
+    return pack
@@ -1,17 +1,43 @@
 import streamlit as st
 import io
-from datetime import datetime
 import json
+import re
+import tempfile
+import uuid
+import zipfile
 import PIL.Image
+from utils.image_result import ImageResult
+from utils.history_store import history_store
+from utils.thumbnail_pack import get_thumbnail_pack
+
+# Formats that are already compressed and are stored in ZIPs without recompression
+ZIP_STORED_FORMATS = {'PNG', 'JPEG', 'WEBP', 'GIF'}
+
+# Query parameter that carries the visitor's owner ID across page reloads
+OWNER_QUERY_PARAM = "session"
+
+def get_owner_id():
+    """Opaque ID that scopes history and batch jobs to the current visitor.
+
+    It is also kept in the page URL, so reloading the page keeps the same
+    history and jobs; anyone given the full URL shares them.
+    """
+    owner = st.session_state.get('owner_id')
+    if owner is None:
+        owner = st.query_params.get(OWNER_QUERY_PARAM)
+        if not owner or not re.fullmatch(r'[0-9a-f]{32}', owner):
+            owner = uuid.uuid4().hex
+        st.session_state.owner_id = owner
+    if st.query_params.get(OWNER_QUERY_PARAM) != owner:
+        st.query_params[OWNER_QUERY_PARAM] = owner
+    return owner
 
 def init_session_state():
     """Initialize session state variables"""
-    if 'generation_history' not in st.session_state:
-        st.session_state.generation_history = []
-    if 'edit_history' not in st.session_state:
-        st.session_state.edit_history = []
-    if 'analysis_history' not in st.session_state:
-        st.session_state.analysis_history = []
+    get_owner_id()
+    # History lives in the persistent store; the session only tracks which page each view shows
+    if 'history_pages' not in st.session_state:
+        st.session_state.history_pages = {}
 
 def convert_to_pil_image(image):
     """Convert various image formats to PIL Image"""
@@ -20,6 +46,10 @@ def convert_to_pil_image(image):
         if isinstance(image, PIL.Image.Image):
             return image
         
+        # If it's an encoded API result, decode it lazily
+        if isinstance(image, ImageResult):
+            return image.image
+        
         # If it's a Gemini AI response with as_image method
         if hasattr(image, 'as_image'):
             try:
@@ -50,6 +80,12 @@ def convert_to_pil_image(image):
         st.error(f"Error converting image to PIL format: {e}")
         return None
 
+def get_display_image(image):
+    """Return something st.image can render, reusing encoded bytes when available"""
+    if isinstance(image, ImageResult):
+        return image.data
+    return convert_to_pil_image(image)
+
 def enhance_prompt(base_prompt, style, aspect_ratio, quality_boost=True):
     """Enhance user prompt with style and technical improvements"""
     # Style presets
@@ -85,40 +121,37 @@ def enhance_prompt(base_prompt, style, aspect_ratio, quality_boost=True):
     
     return enhanced
 
-def save_to_history(item_type, data):
-    """Save operations to history"""
-    history_item = {
-        'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-        'type': item_type,
-        'data': data
-    }
-    
-    if item_type == 'generation':
-        st.session_state.generation_history.insert(0, history_item)
-        if len(st.session_state.generation_history) > 20:
-            st.session_state.generation_history.pop()
-    elif item_type == 'edit':
-        st.session_state.edit_history.insert(0, history_item)
-        if len(st.session_state.edit_history) > 20:
-            st.session_state.edit_history.pop()
-    else:  # analysis
-        st.session_state.analysis_history.insert(0, history_item)
-        if len(st.session_state.analysis_history) > 20:
-            st.session_state.analysis_history.pop()
+def save_to_history(item_type, data, images=None, search_text=None):
+    """Save operations to history, with a small thumbnail of each resulting image"""
+    owner = get_owner_id()
+    thumbnails = get_thumbnail_pack(owner).add_images(images) if images else None
+    return history_store.add(owner, item_type, data, thumbnails, search_text)
+
+def encode_image(image, format='PNG'):
+    """Encode a PIL image to bytes"""
+    buf = io.BytesIO()
+    image.save(buf, format=format)
+    return buf.getvalue()
 
 def create_download_link(image, filename):
     """Create download button for images"""
     try:
+        # Serve API results straight from their original encoded bytes
+        if isinstance(image, ImageResult):
+            return st.download_button(
+                f"Download {filename}",
+                image.data,
+                f"{filename}.{image.extension}",
+                image.mime_type
+            )
+        
         # Ensure we have a PIL Image
         pil_image = convert_to_pil_image(image)
         
-        buf = io.BytesIO()
-        pil_image.save(buf, format='PNG')
-        buf.seek(0)
-        
+        # Encode only when the button is clicked, not on every rerun
         return st.download_button(
             f"Download {filename}",
-            buf.getvalue(),
+            lambda: encode_image(pil_image, 'PNG'),
             f"{filename}.png",
             "image/png"
         )
@@ -126,6 +159,47 @@ def create_download_link(image, filename):
         st.error(f"Error creating download link: {str(e)}")
         return None
 
+def build_zip_archive(images, manifest, image_details=None, name_prefix="image"):
+    """Write images and a JSON manifest to a temporary ZIP file, one entry at a time.
+
+    Entries are streamed to disk as they are added, so only the current image
+    and the archive index are held in memory.
+    """
+    image_details = image_details or [{} for _ in images]
+    files = []
+    
+    archive = tempfile.TemporaryFile()
+    with zipfile.ZipFile(archive, 'w') as zf:
+        for i, (image, details) in enumerate(zip(images, image_details)):
+            if isinstance(image, ImageResult):
+                data, image_format, extension = image.data, image.format, image.extension
+            else:
+                data, image_format, extension = encode_image(convert_to_pil_image(image), 'PNG'), 'PNG', 'png'
+            
+            name = f"{name_prefix}_{i+1}.{extension}"
+            compress_type = zipfile.ZIP_STORED if image_format in ZIP_STORED_FORMATS else zipfile.ZIP_DEFLATED
+            zf.writestr(name, data, compress_type=compress_type)
+            files.append({'file': name, **details})
+        
+        manifest = {**manifest, 'files': files}
+        zf.writestr("manifest.json", json.dumps(manifest, indent=2), compress_type=zipfile.ZIP_DEFLATED)
+    
+    archive.seek(0)
+    return archive
+
+def create_zip_download(images, manifest, filename, image_details=None, name_prefix="image"):
+    """Create a download button that builds the ZIP archive only when clicked"""
+    try:
+        return st.download_button(
+            f"Download All as ZIP ({len(images)} images)",
+            lambda: build_zip_archive(images, manifest, image_details, name_prefix),
+            f"{filename}.zip",
+            "application/zip"
+        )
+    except Exception as e:
+        st.error(f"Error creating ZIP download: {str(e)}")
+        return None
+
 def get_css_styles():
     """Return CSS styles for the application"""
     return """